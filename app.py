@@ -5,7 +5,6 @@ import matplotlib.container as mcontainer
 import seaborn as sns
 import collections.abc
 import collections
-from sklearn.metrics import roc_curve, auc
 
 # --- FIX COMPATIBILITÀ PYTHON 3.10+ ---
 if not hasattr(collections, 'Mapping'): collections.Mapping = collections.abc.Mapping
@@ -24,25 +23,36 @@ from src.ml_models import (
     waterDecTree, 
     waterKnn, 
     waterNeuralNetwork, 
-    waterNaiveBayes
+    waterNaiveBayes,
+    waterHistGradientBoosting
 )
-from src.expert_system import BaseWaterExpert, DEFAULT_PH_MIN, DEFAULT_PH_MAX
+from src.expert_system import DEFAULT_PH_MIN, DEFAULT_PH_MAX
+from src.incremental_diagnosis import diagnosisSession
+from src.parallel_cv import run_parallel_cv
+from src.learning_curve import run_learning_curve, plot_learning_curves, estimate_fit_time
+from src.feature_importance import run_permutation_importance, plot_importances
 
 # Configurazione pagina
 st.set_page_config(page_title="Water Quality AI", layout="wide", page_icon="💧")
 
-# --- CLASSE BRIDGE STREAMLIT-EXPERTA ---
-class StreamlitExpert(BaseWaterExpert):
-    """Bridge per inviare notifiche Experta alla UI di Streamlit."""
-    def notify(self, message, msg_type="info"):
-        if msg_type == "error":
-            st.error(message)
-        elif msg_type == "warning":
-            st.warning(message)
-        elif msg_type == "success":
-            st.success(message)
+# --- BRIDGE STREAMLIT-EXPERTA ---
+def get_diagnosis_session():
+    """Sessione di diagnosi incrementale dell'utente: a ogni invio si rivalutano solo i parametri cambiati."""
+    if "diagnosis_session" not in st.session_state:
+        st.session_state.diagnosis_session = diagnosisSession()
+    return st.session_state.diagnosis_session
+
+def show_findings(findings):
+    """Mostra nella UI i record della diagnosi prodotti dal motore."""
+    for finding in findings:
+        if finding["type"] == "error":
+            st.error(finding["message"])
+        elif finding["type"] == "warning":
+            st.warning(finding["message"])
+        elif finding["type"] == "success":
+            st.success(finding["message"])
         else:
-            st.info(message)
+            st.info(finding["message"])
 
 # --- CACHING DATI & MODELLI ---
 @st.cache_data
@@ -63,6 +73,8 @@ def train_and_evaluate_models(_data):
         models['KNN'] = waterKnn(_data, test_size)
         models['Neural Network'] = waterNeuralNetwork(_data, test_size)
         models['Naive Bayes'] = waterNaiveBayes(_data, test_size)
+        # Unico modello senza Imputer: i NaN sono gestiti dal boosting a istogrammi
+        models['Gradient Boosting'] = waterHistGradientBoosting(_data, test_size)
         
         # Training effettivo
         for name, model in models.items():
@@ -70,6 +82,11 @@ def train_and_evaluate_models(_data):
             
     return models
 
+@st.cache_resource
+def get_numpy_predictors(_data):
+    """Modelli addestrati esportati in NumPy puro: scoring del singolo campione in microsecondi."""
+    return {name: model.export_numpy() for name, model in train_and_evaluate_models(_data).items()}
+
 # --- MAIN APP ---
 def main():
     st.title("💧 Water Quality AI System")
@@ -146,7 +163,9 @@ def main():
             st.markdown("### 🟢 Distribuzione Potabilità")
             # Grafico Seaborn
             fig, ax = plt.subplots(figsize=(6, 4))
-            sns.countplot(x="Potability", data=df, palette="viridis", ax=ax)
+            # Conteggi già aggregati dall'indice delle statistiche (niente ricalcolo a ogni rerun)
+            counts = data_obj.get_class_counts()
+            sns.barplot(x=counts.index, y=counts.values, hue=counts.index, palette="viridis", legend=False, ax=ax)
             ax.set_title("0 = Non Potabile, 1 = Potabile")
             # Aggiunta etichette
             for container in ax.containers:
@@ -157,7 +176,7 @@ def main():
         with col2:
             st.markdown("### 🔥 Matrice di Correlazione")
             fig, ax = plt.subplots(figsize=(8, 6))
-            sns.heatmap(df.corr(numeric_only=True), annot=True, fmt=".2f", cmap="coolwarm", ax=ax)
+            sns.heatmap(data_obj.get_correlation_matrix(), annot=True, fmt=".2f", cmap="coolwarm", ax=ax)
             st.pyplot(fig)
 
         st.divider()
@@ -196,7 +215,8 @@ def main():
                 with c2:
                     st.write("**Matrice di Confusione:**")
                     try:
-                        cm = model.get_confusion_matrix() # Ora restituisce la matrice!
+                        evaluation = model.get_evaluation()
+                        cm = evaluation["confusion_matrix"] if evaluation is not None else None
                         
                         if cm is not None:
                             fig_cm, ax_cm = plt.subplots(figsize=(3, 3))
@@ -217,13 +237,11 @@ def main():
                 with c3:
                     st.write("**Curva ROC:**")
                     try:
-                        # Estrazione dell'estimator dalla Pipeline (ultimo step)
-                        estimator = model.model.steps[-1][1] if hasattr(model.model, 'steps') else model.model
+                        # Curva già calcolata nel record di valutazione (nessuna nuova inferenza)
+                        evaluation = model.get_evaluation()
                         
-                        if hasattr(estimator, "predict_proba"):
-                            y_probs = model.model.predict_proba(model.x_test)[:, 1]
-                            fpr, tpr, _ = roc_curve(model.y_test, y_probs)
-                            roc_auc = auc(fpr, tpr)
+                        if evaluation is not None and evaluation.get("proba") is not None:
+                            fpr, tpr, roc_auc = evaluation["fpr"], evaluation["tpr"], evaluation["auc"]
                             
                             fig_roc, ax_roc = plt.subplots(figsize=(3, 3))
                             ax_roc.plot(fpr, tpr, color='darkorange', lw=2, label=f'AUC = {roc_auc:.2f}')
@@ -251,46 +269,109 @@ def main():
                         ax_bar.bar_label(container, fmt='%.2f', padding=3)
                 st.pyplot(fig_bar)
 
+        st.divider()
+        st.subheader("⚡ Cross-Validation Parallela (10-fold)")
+        st.markdown("Tutti i modelli x 10 fold vengono eseguiti su un pool di processi; i risultati arrivano man mano che i fold terminano.")
+
+        if st.button("⚡ Avvia Cross-Validation"):
+            models = train_and_evaluate_models(data_obj)
+            progress = st.progress(0.0, text="Avvio dei worker...")
+
+            def on_fold_done(name, fold, result, done, total):
+                progress.progress(done / total, text=f"{name} - fold {fold + 1}: accuracy {result['Accuracy']:.3f} ({done}/{total})")
+
+            report = run_parallel_cv(models, folds=10, callback=on_fold_done)
+
+            cv_rows = [{"Model": name, **{f"{m} (mean)": model.cv_means[m] for m in model.cv_means},
+                        "Accuracy (std)": model.cv_stds['Accuracy']}
+                       for name, model in models.items()]
+            st.dataframe(pd.DataFrame(cv_rows).set_index("Model").style.format("{:.3f}"))
+            if report['cached']:
+                st.caption(f"Dalla cache CV (non rieseguiti): {', '.join(report['cached'])}")
+            if len(report['cached']) < len(models):
+                st.info(f"Tempo reale: {report['wall_time']:.1f}s | Somma dei task (sequenziale): "
+                        f"{report['task_time']:.1f}s | Speedup: {report['speedup']:.2f}x")
+
+        st.divider()
+        st.subheader("📈 Curva di Apprendimento (5-fold)")
+        st.markdown("Accuratezza, tempo di fit e picco di memoria al crescere del train set (passi geometrici), per stimare il costo dei riaddestramenti su dataset più grandi.")
+
+        if st.button("📈 Calcola Curva di Apprendimento"):
+            models = train_and_evaluate_models(data_obj)
+            progress = st.progress(0.0, text="Avvio dei worker...")
+
+            def on_step_done(name, fold, size, result, done, total):
+                progress.progress(done / total, text=f"{name} - fold {fold + 1}, {size} righe ({done}/{total})")
+
+            lc_report = run_learning_curve(models, folds=5, callback=on_step_done)
+            st.pyplot(plot_learning_curves(lc_report))
+            st.dataframe(pd.DataFrame([
+                {"Model": name, "Esponente tempo di fit": curve["fit_time_exponent"],
+                 "Fit stimato 100k righe (s)": estimate_fit_time(curve, 100_000)}
+                for name, curve in lc_report["curves"].items()
+            ]).set_index("Model").style.format("{:.2f}"))
+
+        st.divider()
+        st.subheader("🔬 Importanza delle Feature (permutazione)")
+        st.markdown("Calo di accuratezza sul test set quando un parametro viene rimescolato: indica quali sensori contano davvero per ogni modello (barre = intervallo di confidenza al 95%).")
+
+        if st.button("🔬 Calcola Importanza"):
+            models = train_and_evaluate_models(data_obj)
+            with st.spinner("Permutazioni in corso sul pool di processi..."):
+                fi_report = run_permutation_importance(models, n_repeats=10)
+            st.pyplot(plot_importances(fi_report))
+
     # --- TAB 3: SISTEMA ESPERTO (IBRIDO) ---
     with tabs[2]:
         st.header("🕵️ Diagnostica Basata su Regole")
         st.info("Il sistema analizza i dati inseriti nella Sidebar confrontandoli con l'Ontologia OWL.")
         
         if submit_btn:
-            # Istanziazione Engine collegato a Streamlit
-            engine = StreamlitExpert()
-            engine.reset()
-            
-            # Caricamento Fatti (Tutti i 9 parametri)
-            engine.declare(Fact(param='ph', value=in_ph))
-            engine.declare(Fact(param='hardness', value=in_hardness))
-            engine.declare(Fact(param='solids', value=in_solids))
-            engine.declare(Fact(param='chloramines', value=in_chloramines))
-            engine.declare(Fact(param='sulfate', value=in_sulfate))
-            engine.declare(Fact(param='conductivity', value=in_conductivity))
-            engine.declare(Fact(param='organic_carbon', value=in_organic))
-            engine.declare(Fact(param='trihalomethanes', value=in_thm))
-            engine.declare(Fact(param='turbidity', value=in_turbidity))
+            # Sessione incrementale (nessuna nuova istanza né ricarica delle soglie)
+            session = get_diagnosis_session()
+            sample = {'ph': in_ph, 'hardness': in_hardness, 'solids': in_solids,
+                      'chloramines': in_chloramines, 'sulfate': in_sulfate,
+                      'conductivity': in_conductivity, 'organic_carbon': in_organic,
+                      'trihalomethanes': in_thm, 'turbidity': in_turbidity}
 
             # --- NUOVO: Passaggio osservazioni qualitative ---
-            if obs_turbidity:
-                engine.declare(Fact(osservazione_torbida="si"))
-            if obs_odor:
-                engine.declare(Fact(osservazione_odore="si"))
-            if obs_taste:
-                engine.declare(Fact(osservazione_sapore="si"))
-            
+            observations = [name for name, flag in (("osservazione_torbida", obs_turbidity),
+                                                    ("osservazione_odore", obs_odor),
+                                                    ("osservazione_sapore", obs_taste)) if flag]
+
             # Esecuzione
             st.markdown("### 📝 Report Analisi")
-            engine.run()
-            
+            first_analysis = not session.facts
+            diagnosis = session.update(sample, observations)
+            show_findings(diagnosis["findings"])
+
+            # Differenze rispetto all'analisi precedente della sessione
+            previous = diagnosis["previous"]
+            if not first_analysis and diagnosis["changed"]:
+                with st.expander(f"🔄 Variazioni rispetto all'analisi precedente ({', '.join(diagnosis['changed'])})"):
+                    st.caption(f"Regole rieseguite: {diagnosis['fired']} | Anomalie: {previous['problems_count']} → {diagnosis['problems_count']} | "
+                               f"Intervento: {previous['csp_suggestion']} → {diagnosis['csp_suggestion']}")
+                    for finding in diagnosis["added"]:
+                        st.markdown(f"➕ {finding['message']}")
+                    for finding in diagnosis["removed"]:
+                        st.markdown(f"➖ {finding['message']}")
+
             # Riepilogo Problemi
-            if engine.problems_count > 0:
-                st.error(f"🔴 Rilevate {engine.problems_count} anomalie critiche!")
-                if engine.csp_suggestion:
-                    st.warning(f"💡 Azione Richiesta: Necessario intervento '{engine.csp_suggestion}'. Vai al tab 'Gestione Turni'.")
+            if diagnosis["problems_count"] > 0:
+                st.error(f"🔴 Rilevate {diagnosis['problems_count']} anomalie critiche!")
+                if diagnosis["csp_suggestion"]:
+                    st.warning(f"💡 Azione Richiesta: Necessario intervento '{diagnosis['csp_suggestion']}'. Vai al tab 'Gestione Turni'.")
             else:
                 st.success("✅ Tutti i parametri rientrano nelle soglie di sicurezza WHO/Ontologia.")
+
+            # Confronto con i modelli ML (predittori NumPy, stesso ordine di FEATURES)
+            st.markdown("### 🧠 Potabilità Stimata dai Modelli ML")
+            values = [in_ph, in_hardness, in_solids, in_chloramines, in_sulfate,
+                      in_conductivity, in_organic, in_thm, in_turbidity]
+            predictors = get_numpy_predictors(data_obj)
+            st.dataframe(pd.DataFrame(
+                [{"Model": name, "P(Potabile)": p.predict_one(values)} for name, p in predictors.items()]
+            ).set_index("Model").style.format("{:.2f}"))
         else:
             st.write("👈 Inserisci i dati nella Sidebar e clicca 'Analizza Campione'.")
 
@@ -0,0 +1,36 @@
+import argparse
+import warnings
+import sys
+
+from src.benchmark import (BENCHMARK_MODELS, run_benchmark, save_results, load_results,
+                           compare_results, print_results, print_regressions)
+
+warnings.filterwarnings('ignore')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark di training e inferenza dei classificatori.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[3276, 100_000, 1_000_000],
+                        help="Numero di righe per ogni scala (3276 = dataset reale, es. 10000000 per 10M)")
+    parser.add_argument("--models", nargs="+", choices=list(BENCHMARK_MODELS), default=None,
+                        help="Modelli da misurare (default: tutti)")
+    parser.add_argument("--latency-samples", type=int, default=500)
+    parser.add_argument("--batch-rows", type=int, default=20_000)
+    parser.add_argument("--cv-folds", type=int, default=5,
+                        help="Fold della Cross-Validation cronometrata (0 = non misurarla)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", default=None, help="JSON di una run precedente da usare come baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Peggioramento tollerato (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    print("--- Benchmark Modelli ML ---")
+    report = run_benchmark(args.scales, args.models, args.latency_samples, args.batch_rows,
+                           cv_folds=args.cv_folds)
+    print_results(report)
+    save_results(report, args.output)
+    print(f"Risultati salvati in {args.output}")
+
+    if args.compare:
+        regressions = compare_results(load_results(args.compare), report, args.tolerance)
+        print_regressions(regressions, args.tolerance)
+        if regressions:
+            sys.exit(1)
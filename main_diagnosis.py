@@ -0,0 +1,28 @@
+import argparse
+import json
+
+from src.data_loader import WATER_DATA_FILE
+from src.expert_system import THRESHOLD_SPECS
+from src.batch_diagnosis import DIAGNOSIS_SHARD_SIZE, run_batch_diagnosis, print_batch_report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Diagnosi in blocco di un archivio di campioni con il sistema esperto.")
+    parser.add_argument("--input", default=WATER_DATA_FILE, help="CSV dei campioni (colonne del dataset)")
+    parser.add_argument("--output", default="diagnosi.csv", help="CSV dei risultati, scritto man mano")
+    parser.add_argument("--shard-size", type=int, default=DIAGNOSIS_SHARD_SIZE, help="Campioni per blocco")
+    parser.add_argument("--workers", type=int, default=None, help="Processi worker (default: tutti i core)")
+    parser.add_argument("--thresholds", type=json.loads, default=None,
+                        help=f"Soglie da sostituire, in JSON (es. '{{\"SULFATE_MAX\": 300}}'); nomi: {', '.join(THRESHOLD_SPECS)}")
+    args = parser.parse_args()
+
+    unknown = set(args.thresholds or {}) - set(THRESHOLD_SPECS)
+    if unknown:
+        parser.error(f"Soglie sconosciute: {', '.join(sorted(unknown))}")
+
+    print("--- Diagnosi in Blocco (Sistema Esperto) ---")
+    report = run_batch_diagnosis(
+        args.input, args.output, shard_size=args.shard_size, workers=args.workers,
+        thresholds=args.thresholds,
+        callback=lambda rows, seconds: print(f"   {rows} campioni scritti ({seconds:.1f}s)")
+    )
+    print_batch_report(report)
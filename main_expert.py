@@ -1,11 +1,14 @@
 # --- FUNZIONI MAIN ---
 
-from src.expert_system import WaterExpert
+from src.expert_system import WaterExpert, BaseWaterExpert, PARAM_COLUMNS
+from src.data_loader import waterData
+from src.rule_profiler import ruleProfiler
 from src.ontology_manager import waterOntology
+from src.rule_compiler import check_parity, print_parity
 
 
 def main_agent():
-    expert_agent = WaterExpert()
+    expert_agent = WaterExpert(verbose=True)
     expert_agent.reset()
     
     try:
@@ -19,6 +22,30 @@ def main_agent():
 
     # expert_agent.print_facts() # Decommentare per debug
 
+def main_screening():
+    # Regole compilate in NumPy: tutto il dataset in pochi millisecondi,
+    # confrontato campione per campione con il motore experta
+    try:
+        print_parity(check_parity())
+    except KeyboardInterrupt:
+        print("\n\n[!] Interruzione utente rilevata. Torno al menu...")
+
+def main_profile(path="rule_profile.json"):
+    # Diagnosi di tutto il dataset con il profiler agganciato al motore:
+    # regole più costose, fatti dichiarati per run e dimensione dell'agenda
+    engine = BaseWaterExpert()
+    profiler = ruleProfiler()
+    profiler.attach(engine)
+    frame = waterData().get_data()
+    try:
+        for row in frame.to_dict("records"):
+            engine.diagnose({param: row[column] for param, column in PARAM_COLUMNS.items()})
+    except KeyboardInterrupt:
+        print("\n\n[!] Interruzione utente rilevata. Profilo parziale:")
+    profiler.print_table()
+    profiler.save_json(path)
+    print(f"Profilo salvato in: {path}")
+
 def main_ontology():
     try:
         do = waterOntology()
@@ -58,7 +85,7 @@ if __name__ == '__main__':
 
     print("Benvenuto in WATER QUALITY EXPERT, sistema esperto per l'analisi della potabilità.")
     while not exit_program:
-        print("\n-----------> MENU <-----------\n[1] Enciclopedia Parametri (Ontologia)\n[2] Analisi Nuovo Campione (Sistema Esperto)\n[3] Esci")
+        print("\n-----------> MENU <-----------\n[1] Enciclopedia Parametri (Ontologia)\n[2] Analisi Nuovo Campione (Sistema Esperto)\n[3] Screening del Dataset (Regole Vettoriali)\n[4] Profilo delle Regole (Sistema Esperto)\n[5] Esci")
         
         try:
             user_choose = int(input("Scelta: "))
@@ -70,6 +97,10 @@ if __name__ == '__main__':
         elif user_choose == 2:
             main_agent()
         elif user_choose == 3:
+            main_screening()
+        elif user_choose == 4:
+            main_profile()
+        elif user_choose == 5:
             print("Chiusura programma...")
             exit_program = True
         else:
@@ -8,8 +8,12 @@ from src.ml_models import (
     waterDecTree, 
     waterKnn, 
     waterNeuralNetwork, # <--- NUOVO
-    waterNaiveBayes     # <--- NUOVO
+    waterNaiveBayes,    # <--- NUOVO
+    waterHistGradientBoosting
 )
+from src.parallel_cv import run_parallel_cv, print_speedup
+from src.feature_importance import run_permutation_importance, print_importances
+from src.cascade import waterCascade
 import warnings
 
 warnings.filterwarnings('ignore') 
@@ -52,26 +56,31 @@ if __name__ == "__main__":
         ("Decision Tree", waterDecTree(data, 0.2, max_depth=10)),
         ("KNN (k=5)", waterKnn(data, 0.2, 5)),
         ("Neural Network (MLP)", waterNeuralNetwork(data, 0.2, hidden_layers=(100, 50, 20))),
-        ("Naive Bayes", waterNaiveBayes(data, 0.2))
+        ("Naive Bayes", waterNaiveBayes(data, 0.2)),
+        ("Gradient Boosting (NaN nativi)", waterHistGradientBoosting(data, 0.2))
     ]
 
-    print("\n--- 2. Addestramento e Generazione Grafici ---")
+    # A. CROSS-VALIDATION (Per la Lode e le Linee Guida)
+    # Tutti i modelli x 10 fold vengono distribuiti su un pool di processi
+    print("\n--- 2. Cross-Validation Parallela (10-fold, tutti i modelli) ---")
+    cv_report = run_parallel_cv(
+        dict(models_to_run), folds=10,
+        callback=lambda name, fold, res, done, total: print(f"   [{done}/{total}] {name} - fold {fold + 1}: acc {res['Accuracy']:.3f}")
+    )
+    print_speedup(cv_report)
+
+    print("\n--- 3. Addestramento e Generazione Grafici ---")
 
     for name, model_obj in models_to_run:
         print(f"\n[{name}] In esecuzione...")
         
-        # A. CROSS-VALIDATION (Per la Lode e le Linee Guida)
-        # Calcola media e deviazione standard su 10 fold
-        print(f"   [1] Esecuzione Cross-Validation (10-fold)...")
-        try:
-            mean_acc, std_acc = model_obj.evaluate_with_cross_validation()
-            print(f"       -> Accuracy Media: {mean_acc:.4f} (± {std_acc:.4f})")
-            # USIAMO QUESTA PER IL REPORT (Più robusta)
-            accuracy_for_report = mean_acc
-        except AttributeError:
-            print("       -> Metodo Cross-Validation non trovato (saltato).")
-            # Se fallisce, usiamo quella del singolo test come fallback
-            accuracy_for_report = model_obj.get_metric("Accuracy")
+        # A. RISULTATI CROSS-VALIDATION (già calcolati in parallelo)
+        # Media e deviazione standard su 10 fold
+        print(f"   [1] Cross-Validation (10-fold)...")
+        mean_acc, std_acc = model_obj.cv_means['Accuracy'], model_obj.cv_stds['Accuracy']
+        print(f"       -> Accuracy Media: {mean_acc:.4f} (± {std_acc:.4f})")
+        # USIAMO QUESTA PER IL REPORT (Più robusta)
+        accuracy_for_report = mean_acc
 
         # B. ADDESTRAMENTO STANDARD (Per i Grafici)
         # Serve per generare la matrice di confusione e la curva ROC su un singolo split
@@ -92,8 +101,8 @@ if __name__ == "__main__":
         acc = model_obj.get_metric("Accuracy")
         final_results.append({"Model": name, "Accuracy": accuracy_for_report})
 
-    # --- 3. CONFRONTO FINALE ---
-    print("\n--- 3. Confronto Finale ---")
+    # --- 4. CONFRONTO FINALE ---
+    print("\n--- 4. Confronto Finale ---")
     
     # Creiamo una vista tabellare dei risultati
     df_summary = pd.DataFrame(final_results)
@@ -106,5 +115,23 @@ if __name__ == "__main__":
     print("\n")
 
     plot_model_comparison(final_results)
+
+    # --- 5. IMPORTANZA DELLE FEATURE ---
+    # Tutti i modelli, compreso il Gradient Boosting senza preprocessing
+    print("\n--- 5. Importanza delle Feature (permutazione sul test set) ---")
+    print_importances(run_permutation_importance(dict(models_to_run), n_repeats=10))
+
+    # --- 6. CASCATA DI CLASSIFICATORI ---
+    # Naive Bayes e Logistic Regression rispondono quando sono sicuri;
+    # i campioni incerti passano a KNN e, per ultimo, alla rete neurale
+    print("\n--- 6. Cascata di Classificatori (metà test set per le soglie, metà per la valutazione) ---")
+    trained = dict(models_to_run)
+    cascade = waterCascade.from_models([
+        ("Naive Bayes", trained["Naive Bayes"]),
+        ("Logistic Regression", trained["Logistic Regression"]),
+        ("KNN (k=5)", trained["KNN (k=5)"]),
+        ("Neural Network (MLP)", trained["Neural Network (MLP)"]),
+    ])
+    cascade.print_report()
     
     print("\n--- Analisi Completata ---")
\ No newline at end of file
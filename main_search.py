@@ -0,0 +1,28 @@
+import argparse
+import warnings
+
+from src.data_loader import waterData
+from src.hyperparameter_search import SEARCH_SPACES, successive_halving_search, print_search_report
+
+warnings.filterwarnings('ignore')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ricerca degli iperparametri a dimezzamenti successivi.")
+    parser.add_argument("--families", nargs="+", choices=list(SEARCH_SPACES), default=None,
+                        help="Famiglie di modelli da ottimizzare (default: tutte)")
+    parser.add_argument("--budget", type=float, default=120.0, help="Tempo massimo in secondi")
+    parser.add_argument("--eta", type=int, default=3, help="Fattore di riduzione a ogni turno")
+    parser.add_argument("--max-configs", type=int, default=27, help="Configurazioni iniziali per famiglia")
+    parser.add_argument("--scoring", choices=["Accuracy", "Precision", "Recall", "F1"], default="Accuracy")
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    args = parser.parse_args()
+
+    print("--- Ricerca Iperparametri (Successive Halving) ---")
+    data = waterData()
+    report = successive_halving_search(
+        data, 0.2, args.families, budget_seconds=args.budget, eta=args.eta,
+        max_configs=args.max_configs, scoring=args.scoring, n_jobs=args.n_jobs,
+        callback=lambda t: print(f"   [turno {t['rung'] + 1}] {t['family']:<20} {t['rows']:>5} righe | "
+                                 f"{t['score']:.3f} | {t['params']}")
+    )
+    print_search_report(report)
@@ -0,0 +1,122 @@
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import pandas as pd
+import numpy as np
+import time
+import os
+
+from .data_loader import FEATURES, WATER_DATA_FILE
+from .expert_system import BaseWaterExpert, PARAM_COLUMNS, load_thresholds
+
+DIAGNOSIS_SHARD_SIZE = 500
+
+# Colonne aggiunte a ogni riga dell'archivio
+DIAGNOSIS_COLUMNS = ["problems_count", "csp_suggestion", "anomalie"]
+
+# Motore del processo worker, creato una sola volta dall'initializer
+_engine = None
+
+
+def _init_worker(thresholds: dict):
+    """Initializer del pool: crea il motore del worker con le soglie del processo principale e lo scalda."""
+    global _engine
+    _engine = BaseWaterExpert(thresholds=thresholds)
+    _engine.diagnose({})
+
+
+def _diagnose_shard(shard_id: int, x):
+    """Task eseguito nel worker: diagnosi di un blocco di campioni (righe x 9 feature, ordine FEATURES)."""
+    columns = {param: FEATURES.index(column) for param, column in PARAM_COLUMNS.items()}
+    problems, suggestions, anomalies = [], [], []
+    for row in x:
+        diagnosis = _engine.diagnose({param: row[j] for param, j in columns.items()})
+        problems.append(diagnosis["problems_count"])
+        suggestions.append(diagnosis["csp_suggestion"])
+        anomalies.append(";".join(f["rule"] for f in diagnosis["findings"] if f["type"] in ("error", "warning")))
+    return shard_id, {"problems_count": problems, "csp_suggestion": suggestions, "anomalie": anomalies}
+
+
+def _read_shards(path: str, shard_size: int):
+    """Blocchi del CSV di input: il DataFrame originale e la matrice delle 9 feature (NaN se mancanti)."""
+    for frame in pd.read_csv(path, chunksize=shard_size):
+        yield frame, frame.reindex(columns=FEATURES).to_numpy(dtype=np.float64)
+
+
+def run_batch_diagnosis(input_path: str = WATER_DATA_FILE, output_path: str = "diagnosi.csv",
+                        shard_size: int = DIAGNOSIS_SHARD_SIZE, workers: int = None,
+                        thresholds: dict = None, callback=None) -> dict:
+    """
+    Diagnosi con il sistema esperto di tutti i campioni di un CSV, ripartiti in blocchi
+    su un pool di processi. Ogni worker tiene un solo BaseWaterExpert, creato all'avvio
+    con le soglie del processo principale ('thresholds' ne sostituisce alcune, es. per
+    rivalutare l'archivio dopo una modifica delle soglie).
+
+    I blocchi in volo (inviati o completati ma non ancora scritti) sono al massimo
+    due per worker, quindi la memoria resta limitata; i risultati sono riportati
+    nell'ordine di input e scritti su disco man mano (colonne originali + DIAGNOSIS_COLUMNS).
+    callback(righe_scritte, secondi), se indicato, riceve l'avanzamento.
+    """
+    workers = workers or os.cpu_count()
+    thresholds = {**load_thresholds(), **(thresholds or {})}
+    start = time.perf_counter()
+    shards = _read_shards(input_path, shard_size)
+    frames, pending, done = {}, set(), {}
+    next_shard, next_write, rows = 0, 0, 0
+    suggestions = {}
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(thresholds,)) as pool, \
+            open(output_path, "w", newline="", encoding="utf-8") as output:
+        exhausted = False
+        while not exhausted or pending:
+            # Blocchi in volo: in coda/in esecuzione più quelli completati ma non ancora scritti.
+            # Se il primo blocco da scrivere tarda, i successivi si accumulano fino al limite
+            # e poi non se ne inviano altri finché non arriva.
+            while not exhausted and len(pending) + len(done) < 2 * workers:
+                shard = next(shards, None)
+                if shard is None:
+                    exhausted = True
+                    break
+                frames[next_shard] = shard[0]
+                pending.add(pool.submit(_diagnose_shard, next_shard, shard[1]))
+                next_shard += 1
+            if not pending:
+                break
+
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                shard_id, result = future.result()
+                done[shard_id] = result
+
+            # Scrittura in ordine: solo i blocchi contigui già completati
+            while next_write in done:
+                frame = frames.pop(next_write).assign(**done.pop(next_write))
+                frame.to_csv(output, header=next_write == 0, index=False)
+                output.flush()
+                for value, count in frame["csp_suggestion"].value_counts(dropna=False).items():
+                    key = value if isinstance(value, str) else "nessuno"
+                    suggestions[key] = suggestions.get(key, 0) + int(count)
+                rows += len(frame)
+                next_write += 1
+                if callback is not None:
+                    callback(rows, time.perf_counter() - start)
+
+    seconds = time.perf_counter() - start
+    return {
+        "input": input_path,
+        "output": output_path,
+        "rows": rows,
+        "shards": next_write,
+        "workers": workers,
+        "seconds": seconds,
+        "rows_per_s": rows / seconds if seconds > 0 else float("inf"),
+        "csp_suggestion": suggestions,
+    }
+
+
+def print_batch_report(report: dict):
+    """Stampa a video il riepilogo della diagnosi in blocco."""
+    print("\n" + "=" * 60)
+    print(f"Campioni diagnosticati: {report['rows']} ({report['shards']} blocchi, {report['workers']} worker)")
+    print(f"Tempo: {report['seconds']:.1f}s ({report['rows_per_s']:,.0f} campioni/s)")
+    print("Interventi suggeriti: " + ", ".join(f"{k}: {v}" for k, v in sorted(report["csp_suggestion"].items())))
+    print(f"Risultati salvati in: {report['output']}")
+    print("=" * 60)
@@ -0,0 +1,119 @@
+from sklearn.utils.validation import check_is_fitted
+from sklearn.exceptions import NotFittedError
+import pyarrow.parquet as pq
+import pandas as pd
+import numpy as np
+import time
+
+from .data_loader import FEATURES
+from .ml_models import waterModel, predict_labels_proba
+
+BATCH_CHUNK_SIZE = 100_000
+
+
+def _iter_chunks(source, chunksize: int):
+    """
+    Blocchi (righe x 9 feature) da array, DataFrame o file (.csv / .parquet).
+    Gli array vengono affettati senza copie; i file sono letti a blocchi.
+    """
+    if isinstance(source, str):
+        if source.endswith(".parquet"):
+            for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize, columns=FEATURES):
+                yield batch.to_pandas()[FEATURES].to_numpy(dtype=np.float64)
+        else:
+            dtypes = {name: np.float64 for name in FEATURES}
+            for chunk in pd.read_csv(source, chunksize=chunksize, usecols=FEATURES, dtype=dtypes):
+                yield chunk[FEATURES].to_numpy()
+        return
+
+    if isinstance(source, pd.DataFrame):
+        source = source[FEATURES].to_numpy()
+    x = np.asarray(source)
+    if x.ndim == 1:
+        x = x.reshape(1, -1)
+    for start in range(0, len(x), chunksize):
+        yield x[start:start + chunksize]
+
+
+class batchScores:
+    """
+    Risultato dello scoring in blocco: una riga per modello.
+    labels: int8 (modelli x campioni); proba: float32, probabilità di Potability=1.
+    """
+
+    def __init__(self, names: list, labels, proba, seconds: dict):
+        self.names = names
+        self.labels = labels
+        self.proba = proba
+        self.seconds = seconds
+        self.rows = labels.shape[1]
+
+    def throughput(self) -> dict:
+        """Campioni al secondo per modello."""
+        return {name: self.rows / t if t > 0 else float("inf") for name, t in self.seconds.items()}
+
+    def get(self, name: str):
+        """Etichette e probabilità di un singolo modello."""
+        i = self.names.index(name)
+        return self.labels[i], self.proba[i]
+
+    def to_frame(self) -> pd.DataFrame:
+        """Vista tabellare: colonne <modello>_label e <modello>_proba."""
+        columns = {}
+        for i, name in enumerate(self.names):
+            columns[f"{name}_label"] = self.labels[i]
+            columns[f"{name}_proba"] = self.proba[i]
+        return pd.DataFrame(columns)
+
+    def print_throughput(self):
+        """Stampa a video il throughput di ogni modello."""
+        print(f"{'MODELLO':<25} | {'RIGHE/S':>14}")
+        print("-" * 42)
+        for name, rate in self.throughput().items():
+            print(f"{name:<25} | {rate:>14,.0f}")
+
+
+def score_batch(models, source, chunksize: int = BATCH_CHUNK_SIZE) -> batchScores:
+    """
+    Classifica in blocco nuovi campioni con uno o più modelli già addestrati.
+    models: un waterModel, una lista oppure un dizionario {nome: waterModel}.
+    Nella lista i modelli prendono il nome della classe; più modelli della stessa
+    classe sono distinti dalla posizione (es. waterKnn#0, waterKnn#2).
+    source: array / DataFrame con le 9 feature, oppure percorso di un file .csv o .parquet.
+    Con una sorgente vuota restituisce array (modelli x 0).
+    """
+    if isinstance(models, waterModel):
+        models = [models]
+    if not isinstance(models, dict):
+        models = list(models)
+        classes = [m.__class__.__name__ for m in models]
+        models = {(cls if classes.count(cls) == 1 else f"{cls}#{i}"): m
+                  for i, (cls, m) in enumerate(zip(classes, models))}
+
+    pipelines = {}
+    for name, model in models.items():
+        try:
+            check_is_fitted(model.model)
+        except NotFittedError:
+            raise ValueError(f"Modello '{name}' non addestrato: chiamare prima predict().")
+        pipelines[name] = model.model
+
+    names = list(pipelines)
+    label_chunks = {name: [] for name in names}
+    proba_chunks = {name: [] for name in names}
+    seconds = {name: 0.0 for name in names}
+
+    for chunk in _iter_chunks(source, chunksize):
+        for name, pipeline in pipelines.items():
+            start = time.perf_counter()
+            labels, proba = predict_labels_proba(pipeline, chunk)
+            seconds[name] += time.perf_counter() - start
+            label_chunks[name].append(labels.astype(np.int8))
+            proba_chunks[name].append(proba.astype(np.float32))
+
+    if not any(label_chunks.values()):
+        return batchScores(names, np.empty((len(names), 0), dtype=np.int8),
+                           np.empty((len(names), 0), dtype=np.float32), seconds)
+    labels = np.vstack([np.concatenate(label_chunks[name]) for name in names])
+    proba = np.vstack([np.concatenate(proba_chunks[name]) for name in names])
+    return batchScores(names, labels, proba, seconds)
@@ -0,0 +1,216 @@
+from sklearn.base import clone
+import pandas as pd
+import numpy as np
+import platform
+import json
+import time
+import os
+
+from .data_loader import waterData, FEATURES, TARGET, PHYSICAL_RANGES
+from .ml_models import (waterLogReg, waterDecTree, waterKnn,
+                        waterNeuralNetwork, waterNaiveBayes, waterHistGradientBoosting,
+                        predict_labels_proba)
+from .model_registry import library_versions
+from .numpy_inference import export_pipeline
+from .split_provider import RANDOM_STATE
+
+# Costruttori dei modelli (senza registro: si vuole misurare il fit vero)
+BENCHMARK_MODELS = {
+    "Logistic Regression": lambda data: waterLogReg(data, 0.2, use_registry=False),
+    "Decision Tree": lambda data: waterDecTree(data, 0.2, use_registry=False),
+    "KNN": lambda data: waterKnn(data, 0.2, use_registry=False),
+    "Neural Network": lambda data: waterNeuralNetwork(data, 0.2, use_registry=False),
+    "Naive Bayes": lambda data: waterNaiveBayes(data, 0.2, use_registry=False),
+    "Gradient Boosting": lambda data: waterHistGradientBoosting(data, 0.2, use_registry=False),
+}
+
+# Metriche confrontate tra due run: True se "più alto è meglio"
+COMPARED_METRICS = {
+    "fit_s": False,
+    "cv_s": False,
+    "batch_rows_per_s": True,
+    "latency_p50_us": False,
+    "latency_p99_us": False,
+    "numpy_latency_p50_us": False,
+}
+
+
+def synthetic_dataset(reference: waterData, rows: int, seed: int = RANDOM_STATE) -> waterData:
+    """
+    Dataset sintetico di 'rows' campioni con le stesse proporzioni di classe,
+    medie/varianze per classe e percentuali di NaN del dataset di riferimento.
+    Se rows coincide con il dataset reale, si usa direttamente quello.
+    """
+    if rows == len(reference.get_data()):
+        return reference
+
+    index = reference.get_statistics_index()
+    rng = np.random.default_rng(seed)
+    counts = reference.get_class_counts()
+    labels = rng.choice(counts.index.to_numpy(), size=rows, p=(counts / counts.sum()).to_numpy())
+
+    x = np.empty((rows, len(FEATURES)), dtype=np.float32)
+    for cls in counts.index:
+        rows_cls = np.flatnonzero(labels == cls)
+        stats = index["classes"][str(cls)]
+        mean = np.array([stats[f]["mean"] for f in FEATURES])
+        std = np.sqrt([stats[f]["var"] for f in FEATURES])
+        x[rows_cls] = rng.normal(mean, std, size=(len(rows_cls), len(FEATURES)))
+
+    lower = np.array([PHYSICAL_RANGES[f][0] for f in FEATURES])
+    upper = np.array([PHYSICAL_RANGES[f][1] for f in FEATURES])
+    np.clip(x, lower, upper, out=x)
+
+    missing_rate = np.array([index["overall"][f]["missing"] / index["rows"] for f in FEATURES])
+    x[rng.random(x.shape) < missing_rate] = np.nan
+
+    frame = pd.DataFrame(x, columns=FEATURES, copy=False)
+    frame[TARGET] = labels.astype(np.int8)
+    return waterData.from_dataframe(frame, compact=True)
+
+
+def _benchmark_model(model, latency_samples: int, batch_rows: int, seed: int, cv_folds: int = 5) -> dict:
+    """
+    Tempo di fit, throughput in blocco e latenza su singola riga di una Pipeline,
+    più la latenza dello stesso modello esportato in NumPy puro.
+    Con cv_folds > 0 misura anche evaluate_with_cross_validation() senza la cache
+    dei risultati CV; il modello ha uno split provider nuovo (vedi run_benchmark),
+    quindi cv_s comprende anche la stima di Imputer/Scaler su ogni fold.
+    """
+    pipeline = clone(model.model)
+    x_train, y_train = model.x_train, model.y_train.ravel()
+    start = time.perf_counter()
+    pipeline.fit(x_train, y_train)
+    fit_s = time.perf_counter() - start
+    del x_train, y_train
+
+    x_test = model.x_test[:batch_rows]
+    start = time.perf_counter()
+    predict_labels_proba(pipeline, x_test)
+    batch_s = time.perf_counter() - start
+
+    rng = np.random.default_rng(seed)
+    rows = x_test[rng.integers(0, len(x_test), size=latency_samples)]
+    latencies = np.empty(latency_samples)
+    for i in range(latency_samples):
+        start = time.perf_counter()
+        pipeline.predict_proba(rows[i:i + 1])
+        latencies[i] = time.perf_counter() - start
+
+    predictor = export_pipeline(pipeline)
+    numpy_latencies = np.empty(latency_samples)
+    for i in range(latency_samples):
+        start = time.perf_counter()
+        predictor.predict_proba(rows[i:i + 1])
+        numpy_latencies[i] = time.perf_counter() - start
+
+    result = {
+        "fit_s": fit_s,
+        "batch_rows_per_s": len(x_test) / batch_s if batch_s > 0 else float("inf"),
+        "latency_p50_us": float(np.percentile(latencies, 50) * 1e6),
+        "latency_p99_us": float(np.percentile(latencies, 99) * 1e6),
+        "numpy_latency_p50_us": float(np.percentile(numpy_latencies, 50) * 1e6),
+    }
+    if cv_folds > 0:
+        model.use_cv_cache = False
+        start = time.perf_counter()
+        model.evaluate_with_cross_validation(folds=cv_folds)
+        result["cv_s"] = time.perf_counter() - start
+    return result
+
+
+def run_benchmark(scales: list, models: list = None, latency_samples: int = 500,
+                  batch_rows: int = 20_000, seed: int = RANDOM_STATE, cv_folds: int = 5) -> dict:
+    """
+    Esegue il benchmark dei modelli richiesti (default: tutti) a ogni scala del dataset.
+    La scala pari alla dimensione del CSV usa i dati reali, le altre dati sintetici.
+    cv_folds: fold della Cross-Validation cronometrata (0 = non misurarla).
+    """
+    models = models or list(BENCHMARK_MODELS)
+    reference = waterData()
+    results = []
+    for rows in scales:
+        data = synthetic_dataset(reference, rows, seed)
+        for name in models:
+            print(f"[Benchmark] {name} @ {rows:,} righe...")
+            entry = {"model": name, "rows": rows}
+            # Split provider nuovo per ogni modello: Imputer/Scaler dei fold non arrivano
+            # già stimati dai modelli precedenti, così cv_s non dipende da ordine e sottoinsieme
+            data._split_providers.clear()
+            entry.update(_benchmark_model(BENCHMARK_MODELS[name](data), latency_samples, batch_rows, seed, cv_folds))
+            results.append(entry)
+        del data
+
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "versions": library_versions(),
+            "seed": seed,
+            "latency_samples": latency_samples,
+            "batch_rows": batch_rows,
+            "cv_folds": cv_folds,
+        },
+        "results": results,
+    }
+
+
+def save_results(report: dict, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+
+def load_results(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare_results(baseline: dict, current: dict, tolerance: float = 0.10) -> list:
+    """
+    Confronta due run (stesso modello e stessa scala) e restituisce le regressioni:
+    metriche peggiorate di oltre 'tolerance' (frazione) rispetto alla baseline.
+    """
+    previous = {(r["model"], r["rows"]): r for r in baseline["results"]}
+    regressions = []
+    for entry in current["results"]:
+        old = previous.get((entry["model"], entry["rows"]))
+        if old is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if metric not in old or metric not in entry:
+                continue
+            before, after = old[metric], entry[metric]
+            if before <= 0:
+                continue
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            if worse > tolerance:
+                regressions.append({"model": entry["model"], "rows": entry["rows"], "metric": metric,
+                                    "baseline": before, "current": after, "change": change})
+    return regressions
+
+
+def print_results(report: dict):
+    """Stampa a video la tabella dei risultati."""
+    print("\n" + "=" * 126)
+    print(f"{'MODELLO':<22} | {'RIGHE':>11} | {'FIT (s)':>9} | {'CV (s)':>9} | {'BATCH (righe/s)':>16} | "
+          f"{'P50 (us)':>9} | {'P99 (us)':>9} | {'NUMPY P50':>10}")
+    print("-" * 126)
+    for r in report["results"]:
+        cv = f"{r['cv_s']:>9.3f}" if "cv_s" in r else f"{'-':>9}"
+        print(f"{r['model']:<22} | {r['rows']:>11,} | {r['fit_s']:>9.3f} | {cv} | {r['batch_rows_per_s']:>16,.0f} | "
+              f"{r['latency_p50_us']:>9.1f} | {r['latency_p99_us']:>9.1f} | {r.get('numpy_latency_p50_us', 0):>10.1f}")
+    print("=" * 126)
+
+
+def print_regressions(regressions: list, tolerance: float):
+    """Stampa a video le regressioni trovate dal confronto."""
+    if not regressions:
+        print(f"Nessuna regressione oltre il {tolerance * 100:.0f}%.")
+        return
+    print(f"REGRESSIONI (oltre il {tolerance * 100:.0f}%):")
+    for r in regressions:
+        print(f"   {r['model']:<22} @ {r['rows']:>11,} | {r['metric']:<17} "
+              f"{r['baseline']:.4g} -> {r['current']:.4g} ({r['change'] * 100:+.1f}%)")
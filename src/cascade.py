@@ -0,0 +1,163 @@
+from sklearn.model_selection import train_test_split
+import numpy as np
+import time
+
+from .ml_models import waterModel, predict_labels_proba
+
+
+def _confidence(proba):
+    """Confidenza di una previsione binaria: probabilità della classe scelta."""
+    return np.maximum(proba, 1.0 - proba)
+
+
+class waterCascade:
+    """
+    Cascata di classificatori già addestrati, dal più economico al più costoso.
+    Ogni stadio risponde solo sui campioni per cui è abbastanza sicuro
+    (predict_proba sopra la propria soglia); gli altri passano allo stadio
+    successivo. L'ultimo stadio risponde su tutto ciò che resta.
+    """
+
+    def __init__(self, stages: list, target_gap: float = 0.01):
+        # stages: lista di (nome, waterModel); l'ultimo è il modello di riserva
+        self.stages = stages
+        self.target_gap = target_gap
+        self.thresholds = [np.inf] * (len(stages) - 1)
+        self.reference_name = None
+        self.reference_accuracy = None
+        # Parte del test set riservata alla valutazione (impostata da from_models)
+        self.x_eval = None
+        self.y_eval = None
+
+    @classmethod
+    def from_models(cls, stages: list, calibration_fraction: float = 0.5, target_gap: float = 0.01):
+        """
+        Costruisce e calibra la cascata sul test set condiviso dai modelli:
+        una parte serve a scegliere le soglie, il resto a valutarla (vedi evaluate()).
+        """
+        cascade = cls(stages, target_gap)
+        first: waterModel = stages[0][1]
+        x_test, y_test = first.x_test, first.y_test.ravel()
+        cal_idx, eval_idx = train_test_split(
+            np.arange(len(y_test)), train_size=calibration_fraction,
+            stratify=y_test, random_state=first.provider.seed)
+        cascade.calibrate(x_test[cal_idx], y_test[cal_idx])
+        cascade.x_eval, cascade.y_eval = x_test[eval_idx], y_test[eval_idx]
+        return cascade
+
+    def calibrate(self, x, y) -> list:
+        """
+        Sceglie le soglie in modo greedy, stadio per stadio: la soglia più bassa
+        (massima copertura) per cui l'accuratezza della cascata resta entro
+        target_gap da quella del modello migliore. I campioni non accettati
+        vengono conteggiati come se li classificasse l'ultimo stadio.
+        """
+        y = np.asarray(y).ravel()
+        n = len(y)
+        predictions = [predict_labels_proba(model.model, x) for _, model in self.stages]
+        accuracies = [float((labels == y).mean()) for labels, _ in predictions]
+        best = int(np.argmax(accuracies))
+        self.reference_name = self.stages[best][0]
+        self.reference_accuracy = accuracies[best]
+        target = self.reference_accuracy - self.target_gap
+
+        fallback_correct = predictions[-1][0] == y
+        remaining = np.arange(n)
+        accepted_correct = 0
+        for i in range(len(self.stages) - 1):
+            if remaining.size == 0:
+                self.thresholds[i] = np.inf
+                continue
+            labels, proba = predictions[i]
+            conf = _confidence(proba[remaining])
+            order = np.argsort(-conf, kind="stable")
+            sorted_conf = conf[order]
+
+            # Accuratezza accettando i primi j campioni più sicuri (j = 0..m)
+            stage_correct = np.concatenate([[0], np.cumsum((labels == y)[remaining][order])])
+            fallback_left = fallback_correct[remaining][order]
+            fallback_rest = fallback_left.sum() - np.concatenate([[0], np.cumsum(fallback_left)])
+            accuracy = (accepted_correct + stage_correct + fallback_rest) / n
+
+            # Tagli validi solo tra confidenze diverse (la soglia è "conf >= t")
+            cuts = np.concatenate([[True], sorted_conf[:-1] > sorted_conf[1:], [True]])
+            feasible = np.flatnonzero(cuts & (accuracy >= target))
+            j = int(feasible.max()) if feasible.size else 0
+
+            self.thresholds[i] = float(sorted_conf[j - 1]) if j > 0 else np.inf
+            accepted_correct += int(stage_correct[j])
+            remaining = remaining[order[j:]]
+        return self.thresholds
+
+    def predict(self, x):
+        """
+        Restituisce (etichette, probabilità di Potability=1, indice dello stadio usato).
+        Ogni stadio lavora in blocco solo sulle righe ancora incerte.
+        """
+        x = np.asarray(x)
+        n = len(x)
+        labels = np.empty(n, dtype=np.int8)
+        proba = np.empty(n, dtype=np.float32)
+        stage_used = np.full(n, -1, dtype=np.int8)
+
+        remaining = np.arange(n)
+        for i, (_, model) in enumerate(self.stages):
+            if remaining.size == 0:
+                break
+            stage_labels, stage_proba = predict_labels_proba(model.model, x[remaining])
+            if i < len(self.thresholds):
+                accept = _confidence(stage_proba) >= self.thresholds[i]
+            else:
+                accept = np.ones(remaining.size, dtype=bool)
+            rows = remaining[accept]
+            labels[rows] = stage_labels[accept]
+            proba[rows] = stage_proba[accept]
+            stage_used[rows] = i
+            remaining = remaining[~accept]
+        return labels, proba, stage_used
+
+    def evaluate(self, x=None, y=None) -> dict:
+        """
+        Accuratezza, copertura di ogni stadio e latenza media per campione,
+        confrontate con il modello di riferimento (il migliore in calibrazione).
+        """
+        if self.reference_name is None:
+            raise ValueError("Cascata non calibrata: chiamare prima calibrate() o usare from_models().")
+        if x is None:
+            if self.x_eval is None:
+                raise ValueError("Nessun insieme di valutazione: passare x e y oppure usare from_models().")
+            x, y = self.x_eval, self.y_eval
+        elif y is None:
+            raise ValueError("Etichette mancanti: passare anche y.")
+        y = np.asarray(y).ravel()
+
+        start = time.perf_counter()
+        labels, _, stage_used = self.predict(x)
+        cascade_time = time.perf_counter() - start
+
+        reference = dict(self.stages)[self.reference_name]
+        start = time.perf_counter()
+        reference_labels, _ = predict_labels_proba(reference.model, x)
+        reference_time = time.perf_counter() - start
+
+        return {
+            "accuracy": float((labels == y).mean()),
+            "reference": self.reference_name,
+            "reference_accuracy": float((reference_labels == y).mean()),
+            "coverage": {name: float((stage_used == i).mean()) for i, (name, _) in enumerate(self.stages)},
+            "latency_us": 1e6 * cascade_time / len(y),
+            "reference_latency_us": 1e6 * reference_time / len(y),
+        }
+
+    def print_report(self, report: dict = None):
+        """Stampa a video soglie, copertura degli stadi e confronto con il riferimento."""
+        report = report or self.evaluate()
+        print(f"\n--- CASCATA ({' -> '.join(name for name, _ in self.stages)}) ---")
+        for (name, _), threshold in zip(self.stages, self.thresholds):
+            print(f"   Soglia {name:<24}: {threshold:.3f}")
+        for name, share in report["coverage"].items():
+            print(f"   Copertura {name:<21}: {share * 100:5.1f}%")
+        print(f"   Accuracy cascata: {report['accuracy']:.4f} | "
+              f"{report['reference']}: {report['reference_accuracy']:.4f}")
+        print(f"   Latenza media: {report['latency_us']:.1f} us/campione "
+              f"(riferimento {report['reference_latency_us']:.1f} us)")
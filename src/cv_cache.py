@@ -0,0 +1,62 @@
+import hashlib
+import json
+import time
+import os
+
+from .data_loader import CACHE_DIR, _read_json, _write_json_atomic
+from .model_registry import library_versions
+
+CV_CACHE_DIR = os.path.join(CACHE_DIR, "cv")
+
+
+class cvResultCache:
+    """
+    Archivio su disco dei risultati di Cross-Validation (metriche e tempi per fold).
+    La chiave è il contenuto della configurazione: dataset (hash), classe e parametri
+    del modello, seed e numero dei fold, metriche calcolate. Se nulla di questo cambia,
+    la CV non viene rieseguita; i risultati valgono solo con le stesse versioni delle librerie.
+    Nota: per i modelli senza random_state fissato si riusa la prima esecuzione salvata.
+    """
+
+    def __init__(self, folder: str = CV_CACHE_DIR):
+        self.folder = folder
+
+    @staticmethod
+    def make_key(fingerprint: str, model_class: str, params: dict, seed: int,
+                 folds: int, scoring: list) -> str:
+        description = json.dumps({
+            "fingerprint": fingerprint,
+            "model_class": model_class,
+            "params": params,
+            "seed": seed,
+            "folds": folds,
+            "scoring": list(scoring),
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(description.encode("utf-8")).hexdigest()
+
+    def _path(self, model_class: str, key: str) -> str:
+        return os.path.join(self.folder, f"{model_class}-{key[:16]}.json")
+
+    def load(self, model_class: str, key: str):
+        """Restituisce la lista dei risultati per fold se presente e compatibile, altrimenti None."""
+        entry = _read_json(self._path(model_class, key))
+        if entry.get("key") != key or entry.get("versions") != library_versions():
+            return None
+        return entry.get("results")
+
+    def save(self, model_class: str, key: str, results: list):
+        """Salva i risultati per fold (scrittura atomica)."""
+        try:
+            _write_json_atomic(self._path(model_class, key), {
+                "key": key,
+                "model_class": model_class,
+                "versions": library_versions(),
+                "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "results": results,
+            })
+        except OSError as e:
+            print(f"[WARN] Risultati CV non salvati in cache: {e}")
+
+
+# Istanza globale
+cv_cache = cvResultCache()
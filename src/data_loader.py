@@ -1,7 +1,10 @@
-from seaborn import heatmap, histplot, countplot
+from seaborn import heatmap, histplot, barplot
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
+import hashlib
+import json
+import re
 import os
 
 # 1. CAMBIO NOME FILE E TARGET
@@ -10,19 +13,465 @@ import os
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 WATER_DATA_FILE = os.path.join(BASE_DIR, "data", "water_potability.csv")
 TARGET = "Potability"
+# Le 9 feature chimico-fisiche (chiavi usate anche da ontologia e sistema esperto)
+FEATURES = ["ph", "Hardness", "Solids", "Chloramines", "Sulfate",
+            "Conductivity", "Organic_carbon", "Trihalomethanes", "Turbidity"]
+STREAM_CHUNK_SIZE = 200_000
+STATS_QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+# Limiti fisici dei parametri: fuori da questi il valore è un errore di misura, non acqua "cattiva"
+PHYSICAL_RANGES = {
+    "ph": (0.0, 14.0),
+    "Hardness": (0.0, np.inf),
+    "Solids": (0.0, np.inf),
+    "Chloramines": (0.0, np.inf),
+    "Sulfate": (0.0, np.inf),
+    "Conductivity": (0.0, np.inf),
+    "Organic_carbon": (0.0, np.inf),
+    "Trihalomethanes": (0.0, np.inf),
+    "Turbidity": (0.0, np.inf),
+}
+
+# Tipi di anomalia. Nella bitmask di riga il bit (tipo * 9 + indice feature) è acceso
+ISSUE_MISSING = 0
+ISSUE_OUT_OF_RANGE = 1
+ISSUE_OUTLIER = 2
+ISSUE_NAMES = ["missing", "out_of_range", "outlier"]
+
+# Cartella degli snapshot binari (Parquet) e dell'indice delle impronte dei file
+CACHE_DIR = os.path.join(BASE_DIR, "data", ".cache")
+FINGERPRINTS_FILE = os.path.join(CACHE_DIR, "fingerprints.json")
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def _read_json(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json_atomic(path: str, content: dict):
+    """Scrive su file temporaneo e poi rinomina: nessun lettore vede file a metà."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(content, f)
+    os.replace(tmp_path, path)
+
+
+def get_file_fingerprint(path: str = WATER_DATA_FILE) -> str:
+    """
+    Restituisce l'hash SHA-256 del contenuto del file.
+    L'hash viene ricordato insieme a dimensione e mtime: finché questi non
+    cambiano non serve rileggere il file (utile con gli export da GB).
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    known = _read_json(FINGERPRINTS_FILE)
+    entry = known.get(path)
+    if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+        return entry["sha256"]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    fingerprint = digest.hexdigest()
+
+    known[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": fingerprint}
+    try:
+        _write_json_atomic(FINGERPRINTS_FILE, known)
+    except OSError as e:
+        print(f"[WARN] Impossibile aggiornare l'indice delle impronte: {e}")
+    return fingerprint
+
+
+def get_frame_fingerprint(frame: pd.DataFrame) -> str:
+    """Impronta di un DataFrame in memoria: hash del contenuto riga per riga."""
+    row_hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()
+
+
+def _cache_prefix(path: str) -> str:
+    """
+    Prefisso degli artefatti di un CSV: nome del file più l'hash del percorso assoluto,
+    così due CSV con lo stesso nome in cartelle diverse non condividono la cache.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    path_hash = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:8]
+    return f"{stem}.{path_hash}."
+
+
+def get_cache_path(path: str, fingerprint: str, suffix: str) -> str:
+    """Percorso di un artefatto di cache legato al percorso e al contenuto del CSV (es. '.parquet')."""
+    return os.path.join(CACHE_DIR, f"{_cache_prefix(path)}{fingerprint[:16]}{suffix}")
+
+
+def _remove_stale_cache(path: str, current: str, suffix: str):
+    """
+    Elimina gli artefatti dello stesso CSV (stesso percorso) generati da versioni
+    precedenti del file, più quelli nel vecchio formato senza hash del percorso.
+    """
+    prefix = _cache_prefix(path)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    legacy = re.compile(re.escape(stem) + r"\.[0-9a-f]{16}" + re.escape(suffix) + "$")
+    for name in os.listdir(CACHE_DIR):
+        full = os.path.join(CACHE_DIR, name)
+        if full == current:
+            continue
+        if (name.startswith(prefix) and name.endswith(suffix)) or legacy.match(name):
+            try:
+                os.remove(full)
+            except OSError:
+                pass
+
+
+def load_snapshot(path: str = WATER_DATA_FILE):
+    """
+    Carica il dataset dallo snapshot Parquet legato all'hash del CSV.
+    Alla prima lettura il CSV viene parsato e salvato in formato colonnare tipizzato;
+    le letture successive aprono il file Parquet in memory-map e saltano il parsing.
+    Restituisce la tupla (DataFrame, fingerprint).
+    """
+    fingerprint = get_file_fingerprint(path)
+    snapshot = get_cache_path(path, fingerprint, ".parquet")
+
+    if os.path.exists(snapshot):
+        try:
+            return pd.read_parquet(snapshot, memory_map=True), fingerprint
+        except Exception as e:
+            print(f"[WARN] Snapshot illeggibile, rileggo il CSV: {e}")
+
+    data = pd.read_csv(path)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{snapshot}.{os.getpid()}.tmp"
+        data.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, snapshot)
+        _remove_stale_cache(path, snapshot, ".parquet")
+    except (ImportError, OSError) as e:
+        # pyarrow assente o cartella non scrivibile: si continua con il solo CSV
+        print(f"[WARN] Snapshot non salvato: {e}")
+    return data, fingerprint
+
+
+class runningStats:
+    """
+    Accumulatore online (Welford, nella variante a blocchi di Chan) di
+    conteggio, media, varianza, minimo e massimo per ogni colonna.
+    La memoria occupata non dipende dal numero di righe viste.
+    """
+
+    def __init__(self, n_features: int):
+        self.count = np.zeros(n_features, dtype=np.int64)
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+        self.min = np.full(n_features, np.inf)
+        self.max = np.full(n_features, -np.inf)
+
+    def update(self, block):
+        """Aggiunge un blocco 2D (righe x colonne). I NaN vengono ignorati colonna per colonna."""
+        block = np.asarray(block, dtype=np.float64)
+        if block.ndim == 1:
+            block = block.reshape(1, -1)
+        valid = ~np.isnan(block)
+        block_count = valid.sum(axis=0)
+        if not block_count.any():
+            return
+
+        # Statistiche del blocco in un'unica passata vettoriale
+        safe_count = np.maximum(block_count, 1)
+        block_mean = np.where(valid, block, 0.0).sum(axis=0) / safe_count
+        deviations = np.where(valid, block - block_mean, 0.0)
+        block_m2 = (deviations * deviations).sum(axis=0)
+
+        # Fusione con lo stato corrente (formula di Chan)
+        total = self.count + block_count
+        safe_total = np.maximum(total, 1)
+        delta = block_mean - self.mean
+        has_values = block_count > 0
+        self.mean = np.where(has_values, self.mean + delta * block_count / safe_total, self.mean)
+        self.m2 = np.where(has_values, self.m2 + block_m2 + delta ** 2 * self.count * block_count / safe_total, self.m2)
+        self.count = total
+
+        self.min = np.minimum(self.min, np.where(valid, block, np.inf).min(axis=0))
+        self.max = np.maximum(self.max, np.where(valid, block, -np.inf).max(axis=0))
+
+    def variance(self, ddof: int = 1):
+        """Varianza campionaria (ddof=1, come pandas); NaN dove i valori sono insufficienti."""
+        denominator = self.count - ddof
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(denominator > 0, self.m2 / denominator, np.nan)
+
+    def to_dict(self, features: list) -> dict:
+        """Statistiche per feature: {feature: {'count', 'mean', 'var', 'min', 'max'}}."""
+        empty = self.count == 0
+        mean = np.where(empty, np.nan, self.mean)
+        variance = self.variance()
+        result = {}
+        for i, name in enumerate(features):
+            result[name] = {
+                "count": int(self.count[i]),
+                "mean": float(mean[i]),
+                "var": float(variance[i]),
+                "min": float(self.min[i]) if not empty[i] else float("nan"),
+                "max": float(self.max[i]) if not empty[i] else float("nan"),
+            }
+        return result
+
+
+def stream_class_statistics(path: str = WATER_DATA_FILE, chunksize: int = STREAM_CHUNK_SIZE,
+                            features: list = FEATURES, target: str = TARGET) -> dict:
+    """
+    Legge il CSV a blocchi e accumula le statistiche per classe in una sola passata,
+    senza mai caricare l'intero file in memoria.
+    Restituisce {classe: runningStats}.
+    """
+    stats = {}
+    dtypes = {name: np.float64 for name in features}
+    for chunk in pd.read_csv(path, chunksize=chunksize, usecols=features + [target], dtype=dtypes):
+        chunk = chunk.dropna(subset=[target])
+        labels = chunk[target].to_numpy()
+        block = chunk[features].to_numpy(dtype=np.float64)
+        for cls in np.unique(labels):
+            stats.setdefault(int(cls), runningStats(len(features))).update(block[labels == cls])
+    return stats
+
+
+def stream_medium_values_water(path: str = WATER_DATA_FILE, chunksize: int = STREAM_CHUNK_SIZE) -> dict:
+    """Versione streaming di waterData.get_medium_values_water(), per CSV troppo grandi per pandas."""
+    stats = stream_class_statistics(path, chunksize)
+    if 1 not in stats:
+        return {name: float("nan") for name in FEATURES}
+    return {name: values["mean"] for name, values in stats[1].to_dict(FEATURES).items()}
+
+
+def _describe(frame: pd.DataFrame) -> dict:
+    """Statistiche descrittive per colonna, calcolate in blocco (nessun ciclo sulle righe)."""
+    summary = frame.agg(["count", "mean", "var", "min", "max"])
+    quantiles = frame.quantile(STATS_QUANTILES)
+    missing = frame.isna().sum()
+    result = {}
+    for name in frame.columns:
+        entry = {stat: float(summary.at[stat, name]) for stat in summary.index}
+        entry["count"] = int(entry["count"])
+        entry["missing"] = int(missing[name])
+        for q in STATS_QUANTILES:
+            entry[f"q{int(q * 100):02d}"] = float(quantiles.at[q, name])
+        result[name] = entry
+    return result
+
+
+def build_statistics_index(data: pd.DataFrame, fingerprint: str) -> dict:
+    """
+    Costruisce l'indice delle statistiche aggregate del dataset:
+    conteggi per classe, statistiche descrittive (globali e per classe),
+    valori mancanti e matrice di correlazione.
+    """
+    correlation = data.corr(numeric_only=True)
+    classes = {}
+    for cls, group in data.groupby(TARGET):
+        classes[str(int(cls))] = _describe(group[FEATURES])
+    return {
+        "fingerprint": fingerprint,
+        "rows": int(len(data)),
+        "features": FEATURES,
+        "class_counts": {str(int(k)): int(v) for k, v in data[TARGET].value_counts().sort_index().items()},
+        "overall": _describe(data[FEATURES]),
+        "classes": classes,
+        "correlation": {"columns": list(correlation.columns), "values": correlation.values.tolist()},
+    }
+
+
+def load_statistics_index(path: str = WATER_DATA_FILE, data: pd.DataFrame = None,
+                          fingerprint: str = None) -> dict:
+    """
+    Restituisce l'indice delle statistiche salvato accanto agli snapshot.
+    Viene ricostruito solo se il CSV è cambiato (impronta diversa);
+    altrimenti si legge il JSON senza toccare i dati.
+    """
+    if fingerprint is None:
+        fingerprint = get_file_fingerprint(path)
+    index_path = get_cache_path(path, fingerprint, ".stats.json")
+
+    index = _read_json(index_path)
+    if index.get("fingerprint") == fingerprint:
+        return index
+
+    if data is None:
+        data, _ = load_snapshot(path)
+    index = build_statistics_index(data, fingerprint)
+    try:
+        _write_json_atomic(index_path, index)
+        _remove_stale_cache(path, index_path, ".stats.json")
+    except OSError as e:
+        print(f"[WARN] Indice statistiche non salvato: {e}")
+    return index
+
+
+def get_reference_values(path: str = WATER_DATA_FILE) -> dict:
+    """Medie dei campioni potabili lette dall'indice (valori di riferimento del Sistema Esperto)."""
+    positives = load_statistics_index(path)["classes"].get("1", {})
+    return {name: positives.get(name, {}).get("mean", float("nan")) for name in FEATURES}
+
+
+class validationReport:
+    """
+    Esito della validazione di un blocco di campioni.
+    bitmask: un uint32 per riga (bit = tipo * 9 + indice feature);
+    summary: conteggio delle anomalie per feature e per tipo.
+    """
+
+    def __init__(self, bitmask, summary: pd.DataFrame):
+        self.bitmask = bitmask
+        self.summary = summary
+
+    @staticmethod
+    def issue_bits(kind: int, feature: str = None):
+        """Maschera di bit di un tipo di anomalia (su una sola feature o su tutte)."""
+        n = len(FEATURES)
+        if feature is not None:
+            return np.uint32(1 << (kind * n + FEATURES.index(feature)))
+        return np.uint32(((1 << n) - 1) << (kind * n))
+
+    def rows_with(self, kind: int, feature: str = None):
+        """Maschera booleana delle righe che presentano l'anomalia indicata."""
+        return (self.bitmask & self.issue_bits(kind, feature)) != 0
+
+    def valid_mask(self, allow_missing: bool = True):
+        """
+        Righe utilizzabili. Di default i NaN sono ammessi, perché
+        le Pipeline di ml_models.py li gestiscono con l'Imputer.
+        """
+        bad = self.issue_bits(ISSUE_OUT_OF_RANGE) | self.issue_bits(ISSUE_OUTLIER)
+        if not allow_missing:
+            bad |= self.issue_bits(ISSUE_MISSING)
+        return (self.bitmask & bad) == 0
+
+    def print_summary(self):
+        """Stampa a video il riepilogo della validazione."""
+        valid = int(self.valid_mask().sum())
+        print(f"Campioni validi: {valid}/{len(self.bitmask)}")
+        print(self.summary.to_string())
+
+
+def validate_samples(x, reference: dict, iqr_factor: float = 3.0) -> validationReport:
+    """
+    Validazione vettoriale di una matrice (righe x 9 feature, nell'ordine di FEATURES):
+    valori mancanti, fuori dai limiti fisici e outlier oltre le barriere di Tukey
+    (Q1 - k*IQR, Q3 + k*IQR) calcolate sull'indice delle statistiche di riferimento.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    overall = reference["overall"]
+    lower = np.array([PHYSICAL_RANGES[name][0] for name in FEATURES])
+    upper = np.array([PHYSICAL_RANGES[name][1] for name in FEATURES])
+    q1 = np.array([overall[name]["q25"] for name in FEATURES])
+    q3 = np.array([overall[name]["q75"] for name in FEATURES])
+    iqr = q3 - q1
+
+    # I confronti con NaN sono sempre False: un valore mancante è solo "missing"
+    flags = np.concatenate([
+        np.isnan(x),
+        (x < lower) | (x > upper),
+        (x < q1 - iqr_factor * iqr) | (x > q3 + iqr_factor * iqr),
+    ], axis=1)
+
+    shifts = np.arange(flags.shape[1], dtype=np.uint32)
+    bitmask = (flags.astype(np.uint32) << shifts).sum(axis=1, dtype=np.uint32)
+
+    counts = flags.sum(axis=0).reshape(len(ISSUE_NAMES), len(FEATURES)).T
+    summary = pd.DataFrame(counts, index=FEATURES, columns=ISSUE_NAMES)
+    return validationReport(bitmask, summary)
+
 
 class waterData: 
 
-    def __init__(self):
-        # Carica e pulisce i dati (rimuove righe con campi vuoti)
-        self.data = pd.read_csv(WATER_DATA_FILE)
-        
+    def __init__(self, path: str = WATER_DATA_FILE, use_cache: bool = True, compact: bool = False):
+        # Carica i dati: dallo snapshot binario se disponibile, altrimenti dal CSV
+        self.path = path
+        self.compact = compact
+        if use_cache:
+            self._data, self.fingerprint = load_snapshot(path)
+        else:
+            self._data = pd.read_csv(path)
+            self.fingerprint = get_file_fingerprint(path)
+        self._setup()
+
+    @classmethod
+    def from_dataframe(cls, frame: pd.DataFrame, compact: bool = False):
+        """
+        Crea un waterData da un DataFrame già in memoria (es. dati sintetici).
+        L'impronta è l'hash del contenuto; l'indice delle statistiche resta in memoria.
+        """
+        obj = cls.__new__(cls)
+        obj.path = None
+        obj.compact = compact
+        obj._data = frame
+        obj.fingerprint = get_frame_fingerprint(frame)
+        obj._setup()
+        return obj
+
+    @property
+    def data(self) -> pd.DataFrame:
+        return self._data
+
+    @data.setter
+    def data(self, frame: pd.DataFrame):
+        """
+        Sostituisce il DataFrame (es. dopo un filtro): l'impronta diventa quella del
+        contenuto e split, trasformatori e indice delle statistiche vengono ricalcolati.
+        Le modifiche in place del DataFrame non sono rilevate: riassegnarlo.
+        """
+        self._data = frame
+        self.path = None
+        self.fingerprint = get_frame_fingerprint(frame)
+        self._setup()
+
+    def __getstate__(self):
+        # I provider di split si ricostruiscono al bisogno: non vanno copiati con l'oggetto
+        state = self.__dict__.copy()
+        state["_split_providers"] = {}
+        return state
+
+    def _setup(self):
         # --- CORREZIONE: RIMOSSO IL DATA LEAKAGE ---
         # Lasciamo i NaN.
         # Saranno gestiti dalla Pipeline di scikit-learn dentro ml_models.py
         # self.data.fillna(self.data.mean(), inplace=True) <--- RIMOSSO
         
         self.features_list = list(self.data.columns)
+        self._stats_index = None
+        # Provider di split per seme (vedi split_provider.get_split_provider): vivono con l'oggetto
+        self._split_providers = {}
+
+        self._x_block = None
+        self._y_block = None
+        self._missing_bits = None
+        if self.compact:
+            # L'indice va calcolato sui float64 originali, prima della conversione
+            self.get_statistics_index()
+            self._to_compact()
+
+    def _to_compact(self):
+        """
+        Modalità compatta: le 9 feature diventano un unico blocco float32 contiguo
+        (sola lettura), il target un vettore int8 e i valori mancanti una bitmap.
+        Il DataFrame viene ricostruito come vista sul blocco, quindi non duplica i dati.
+        """
+        block = np.ascontiguousarray(self.data[FEATURES].to_numpy(dtype=np.float32))
+        labels = self.data[TARGET].to_numpy(dtype=np.int8)
+        block.flags.writeable = False
+        labels.flags.writeable = False
+
+        self._missing_bits = np.packbits(np.isnan(block), axis=1)
+        self._x_block = block
+        self._y_block = labels.reshape(-1, 1)
+
+        frame = pd.DataFrame(block, columns=FEATURES, copy=False)
+        frame[TARGET] = labels
+        self._data = frame
 
     def get_data(self):
         return self.data
@@ -30,11 +479,40 @@ class waterData:
     def get_features(self):
         return self.features_list
 
+    def get_statistics_index(self):
+        """Indice delle statistiche aggregate (persistito su disco, ricostruito solo se il CSV cambia)."""
+        if self._stats_index is None:
+            if self.path is None:
+                self._stats_index = build_statistics_index(self.data, self.fingerprint)
+            else:
+                self._stats_index = load_statistics_index(self.path, self.data, self.fingerprint)
+        return self._stats_index
+
+    def get_class_counts(self):
+        """Numero di campioni per classe di Potability, dall'indice."""
+        counts = self.get_statistics_index()["class_counts"]
+        return pd.Series({int(k): v for k, v in counts.items()}, name=TARGET)
+
+    def get_correlation_matrix(self):
+        """Matrice di correlazione tra le colonne, dall'indice."""
+        corr = self.get_statistics_index()["correlation"]
+        return pd.DataFrame(corr["values"], index=corr["columns"], columns=corr["columns"])
+
+    def validate(self, x=None, iqr_factor: float = 3.0) -> validationReport:
+        """
+        Valida in blocco il dataset (o un lotto esterno x con le 9 feature)
+        usando come riferimento le statistiche di questo dataset.
+        """
+        if x is None:
+            x = self.data[FEATURES].to_numpy()
+        elif isinstance(x, pd.DataFrame):
+            x = x[FEATURES].to_numpy()
+        return validate_samples(x, self.get_statistics_index(), iqr_factor)
+
     def get_heatmap(self):
         """Genera una heatmap della correlazione più leggibile."""
         plt.figure(figsize=(10, 8))
-        # numeric_only=True evita errori futuri con versioni nuove di Pandas
-        corr = self.data.corr(numeric_only=True)
+        corr = self.get_correlation_matrix()
         heatmap(corr, annot=True, fmt=".2f", cmap="coolwarm", cbar=True)
         plt.title("Matrice di Correlazione tra Feature")
         plt.show()
@@ -44,8 +522,9 @@ class waterData:
         plt.figure(figsize=(6, 4))
         plt.style.use("ggplot")
         
-        # Uso countplot di Seaborn: fa tutto da solo (conteggi e colori)
-        ax = countplot(x=TARGET, data=self.data, palette="viridis")
+        # I conteggi arrivano già aggregati dall'indice: basta un barplot
+        counts = self.get_class_counts()
+        ax = barplot(x=counts.index, y=counts.values, hue=counts.index, palette="viridis", legend=False)
         ax.set_title("Distribuzione Potabilità (0=Non Potabile, 1=Potabile)")
         ax.set_xlabel("Classe")
         ax.set_ylabel("Conteggio")
@@ -82,8 +561,20 @@ class waterData:
         plt.xlabel("mg/L")
         plt.show()
 
+    def get_missing_mask(self):
+        """Maschera booleana (righe x feature) dei valori mancanti."""
+        if self._missing_bits is not None:
+            return np.unpackbits(self._missing_bits, axis=1, count=len(FEATURES)).astype(bool)
+        return self.data[FEATURES].isna().to_numpy()
+
     def get_training_data(self):
-        """Restituisce X e y per il training."""
+        """
+        Restituisce X e y per il training.
+        In modalità compatta sono viste di sola lettura sempre sugli stessi array
+        (nessuna copia per chiamata), altrimenti nuove matrici float64.
+        """
+        if self.compact:
+            return self._x_block, self._y_block
         y = self.data[[TARGET]].values
         x = self.data.drop(TARGET, axis='columns').values
         return x, y
@@ -94,21 +585,7 @@ class waterData:
         Calcola le medie per i campioni POTABILI (Target=1).
         Metodo cruciale usato dal Sistema Esperto.
         """
-        medium_values = {}
-        
-        # Filtriamo solo i campioni potabili
-        positives = self.data[self.data[TARGET] == 1]
-        
-        # Pandas .mean() gestisce i NaN automaticamente, quindi non serve pulire prima.
+        # Le medie (calcolate ignorando i NaN) sono già nell'indice delle statistiche.
         # Le chiavi devono corrispondere ai nomi usati nell'ontologia e nel sistema esperto.
-        medium_values['ph'] = positives['ph'].mean()
-        medium_values['Hardness'] = positives['Hardness'].mean()
-        medium_values['Solids'] = positives['Solids'].mean()
-        medium_values['Chloramines'] = positives['Chloramines'].mean()
-        medium_values['Sulfate'] = positives['Sulfate'].mean()
-        medium_values['Conductivity'] = positives['Conductivity'].mean()
-        medium_values['Organic_carbon'] = positives['Organic_carbon'].mean()
-        medium_values['Trihalomethanes'] = positives['Trihalomethanes'].mean()
-        medium_values['Turbidity'] = positives['Turbidity'].mean()
-
-        return medium_values
\ No newline at end of file
+        positives = self.get_statistics_index()["classes"].get("1", {})
+        return {name: positives.get(name, {}).get("mean", float("nan")) for name in FEATURES}
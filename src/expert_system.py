@@ -6,8 +6,10 @@ if not hasattr(collections, 'MutableMapping'): collections.MutableMapping = coll
 if not hasattr(collections, 'Iterable'): collections.Iterable = collections.abc.Iterable
 
 from experta import *
+import inspect
+import time
 from colorama import Fore, Style, init
-from .data_loader import waterData
+from .data_loader import get_reference_values
 from .scheduler import laboratoryCsp
 from .ontology_manager import manager # Importiamo l'istanza del manager
 
@@ -24,6 +26,65 @@ DEFAULT_CONDUCTIVITY_MAX = 800.0  # uS/cm
 DEFAULT_ORGANIC_CARBON_MAX = 10.0 # ppm 
 DEFAULT_THM_MAX = 80.0            # ug/L
 
+# Parametro del sistema esperto -> colonna del dataset, nell'ordine in cui
+# l'app dichiara i fatti Fact(param=..., value=...)
+PARAM_COLUMNS = {
+    "ph": "ph",
+    "hardness": "Hardness",
+    "solids": "Solids",
+    "chloramines": "Chloramines",
+    "sulfate": "Sulfate",
+    "conductivity": "Conductivity",
+    "organic_carbon": "Organic_carbon",
+    "trihalomethanes": "Trihalomethanes",
+    "turbidity": "Turbidity",
+}
+
+# --- CARICAMENTO IBRIDO (Ontologia con Fallback) ---
+# Il sistema cerca la soglia nell'Ontologia. Se fallisce, usa il DEFAULT.
+# Soglia -> (classe OWL, proprietà, default)
+THRESHOLD_SPECS = {
+    # 1. pH (Acido e Basico)
+    "PH_MIN": ("AcidicWater", "has_ph_value", DEFAULT_PH_MIN),
+    "PH_MAX": ("BasicWater", "has_ph_value", DEFAULT_PH_MAX),
+    # 2. Parametri Fisici
+    "TURBIDITY_MAX": ("TurbidWater", "has_turbidity_value", DEFAULT_TURBIDITY_MAX),
+    "SOLIDS_MAX": ("HighSolidsWater", "has_solids_value", DEFAULT_SOLIDS_MAX),
+    "CONDUCTIVITY_MAX": ("HighConductivityWater", "has_conductivity_value", DEFAULT_CONDUCTIVITY_MAX),
+    # 3. Parametri Chimici
+    "SULFATE_MAX": ("HighSulfateWater", "has_sulfate_value", DEFAULT_SULFATE_MAX),
+    "CHLORAMINES_MAX": ("HighChloraminesWater", "has_chloramines_value", DEFAULT_CHLORAMINES_MAX),
+    "HARDNESS_LIMIT": ("HardWater", "has_hardness_value", DEFAULT_HARDNESS_LIMIT),
+    # 4. Parametri Tossici/Biologici
+    "ORGANIC_CARBON_MAX": ("HighCarbonWater", "has_organic_carbon_value", DEFAULT_ORGANIC_CARBON_MAX),
+    "THM_MAX": ("HighTHMWater", "has_trihalomethanes_value", DEFAULT_THM_MAX),
+    # 5. Combinazione critica (corrosione)
+    "PH_CORROSIVE_MAX": ("CorrosiveWater", "has_ph_value", 6.0),
+    "SULFATE_CORROSIVE_MIN": ("CorrosiveWater", "has_sulfate_value", 200.0),
+}
+
+_thresholds = None
+
+
+def load_thresholds(verbose: bool = False, reload: bool = False) -> dict:
+    """
+    Soglie del sistema esperto, cercate nell'ontologia alla prima chiamata e poi
+    riusate da tutte le istanze del processo (reload=True le rilegge, es. dopo
+    una modifica dell'ontologia). Con verbose stampa il riepilogo di debug.
+    """
+    global _thresholds
+    if _thresholds is None or reload:
+        _thresholds = {name: manager.get_threshold(owl_class, prop, default)
+                       for name, (owl_class, prop, default) in THRESHOLD_SPECS.items()}
+    if verbose:
+        # Debug per verificare cosa ha caricato (utile per l'esame)
+        print(f"\n[SISTEMA IBRIDO] Soglie Caricate:")
+        print(f"   -> pH Range: {_thresholds['PH_MIN']} - {_thresholds['PH_MAX']}")
+        print(f"   -> Solfati Max: {_thresholds['SULFATE_MAX']}")
+        print(f"   -> Torbidità Max: {_thresholds['TURBIDITY_MAX']}")
+    return dict(_thresholds)
+
+
 def valid_response(response: str):
     return response.lower().strip() in ["si", "no"]
 
@@ -38,41 +99,107 @@ class BaseWaterExpert(KnowledgeEngine):
     Contiene TUTTA la logica diagnostica. 
     Non fa print() né input(), ma delega l'output al metodo notify().
     """
-    def __init__(self):
+    profiler = None # ruleProfiler opzionale (vedi rule_profiler.py)
+
+    def __init__(self, verbose: bool = False, thresholds: dict = None):
         super().__init__()
         self.problems_count = 0
         self.csp_suggestion = None # 'chemical', 'physical', 'critical'
+        self.findings = [] # Record strutturati della diagnosi (vedi report)
+
+        # Soglie caricate dall'ontologia una sola volta per processo;
+        # 'thresholds' ne sostituisce alcune (es. per simulare una modifica delle soglie).
+        # Se le contiene tutte (es. nei worker della diagnosi in blocco) l'ontologia non viene letta.
+        thresholds = thresholds or {}
+        if not set(THRESHOLD_SPECS).issubset(thresholds):
+            thresholds = {**load_thresholds(verbose), **thresholds}
+        for name, value in thresholds.items():
+            setattr(self, name, value)
+
+    def get_deffacts(self):
+        """
+        Come in experta, ma i nomi dei DefFacts sono cercati una volta per classe
+        invece di ispezionare l'istanza a ogni reset().
+        """
+        cls = type(self)
+        if "_deffacts_names" not in cls.__dict__:
+            cls._deffacts_names = [name for name, obj in inspect.getmembers(self) if isinstance(obj, DefFacts)]
+        deffacts = [getattr(self, name) for name in cls._deffacts_names]
+        for deffact in deffacts:
+            deffact.ke = self
+        return sorted(deffacts, key=lambda deffact: deffact.order)
+
+    def reset(self, **kwargs):
+        """Reset di experta più azzeramento dei contatori: l'istanza si riusa tra i campioni."""
+        self.problems_count = 0
+        self.csp_suggestion = None
+        self.findings = []
+        super().reset(**kwargs)
+
+    def run(self, steps=float('inf')):
+        """
+        Ciclo di esecuzione di experta (agenda aggiornata prima di ogni attivazione),
+        con ogni attivazione eseguita da _fire(): punto di estensione per la
+        diagnosi incrementale e per il profiler delle regole (se agganciato).
+        """
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start_run(self)
+        self.running = True
+        while steps > 0 and self.running:
+            added, removed = self.get_activations()
+            self.strategy.update_agenda(self.agenda, added, removed)
+            if profiler is not None:
+                profiler.record_agenda(len(self.agenda.activations))
+            activation = self.agenda.get_next()
+            if activation is None:
+                break
+            steps -= 1
+            if profiler is None:
+                self._fire(activation)
+            else:
+                start = time.perf_counter()
+                self._fire(activation)
+                profiler.record_rule(activation.rule.__name__, time.perf_counter() - start)
+        self.running = False
+        if profiler is not None:
+            profiler.end_run(self)
+
+    def _fire(self, activation):
+        """Esegue la regola di un'attivazione con le variabili catturate dai pattern."""
+        activation.rule(self, **{k: v for k, v in activation.context.items() if not k.startswith('__')})
+
+    def report(self, rule, message, msg_type="info", value=None):
+        """Registra un esito della diagnosi come record strutturato e lo inoltra a notify()."""
+        self.findings.append({"rule": rule, "type": msg_type, "message": message, "value": value})
+        self.notify(message, msg_type)
+
+    def diagnose(self, sample: dict, observations=()) -> dict:
+        """
+        Diagnosi completa di un campione sulla stessa istanza: reset, dichiarazione
+        dei parametri non NaN (nell'ordine di PARAM_COLUMNS) e delle osservazioni
+        (es. "osservazione_odore"), esecuzione delle regole.
+        sample: {parametro: valore}, con i nomi di PARAM_COLUMNS.
+        """
+        self.reset()
+        # Una sola dichiarazione per tutti i fatti: un solo aggiornamento dell'agenda
+        # (l'ordine di esecuzione delle regole non cambia: dipende dagli id dei fatti)
+        facts = [Fact(param=param, value=float(sample[param])) for param in PARAM_COLUMNS
+                 if sample.get(param) is not None and sample[param] == sample[param]]
+        facts += [Fact(**{observation: "si"}) for observation in observations]
+        if facts:
+            self.declare(*facts)
+        self.run()
+        return self.get_diagnosis()
+
+    def get_diagnosis(self) -> dict:
+        """Esito dell'ultima esecuzione: contatore dei problemi, intervento suggerito e record."""
+        return {
+            "problems_count": self.problems_count,
+            "csp_suggestion": self.csp_suggestion,
+            "findings": list(self.findings),
+        }
 
-        # --- CARICAMENTO IBRIDO (Ontologia con Fallback) ---
-        # Il sistema cerca la soglia nell'Ontologia. Se fallisce, usa il DEFAULT.
-        
-        # 1. pH (Acido e Basico)
-        self.PH_MIN = manager.get_threshold("AcidicWater", "has_ph_value", DEFAULT_PH_MIN)
-        self.PH_MAX = manager.get_threshold("BasicWater", "has_ph_value", DEFAULT_PH_MAX)
-        
-        # 2. Parametri Fisici
-        self.TURBIDITY_MAX = manager.get_threshold("TurbidWater", "has_turbidity_value", DEFAULT_TURBIDITY_MAX)
-        self.SOLIDS_MAX = manager.get_threshold("HighSolidsWater", "has_solids_value", DEFAULT_SOLIDS_MAX)
-        self.CONDUCTIVITY_MAX = manager.get_threshold("HighConductivityWater", "has_conductivity_value", DEFAULT_CONDUCTIVITY_MAX)
-
-        # 3. Parametri Chimici
-        self.SULFATE_MAX = manager.get_threshold("HighSulfateWater", "has_sulfate_value", DEFAULT_SULFATE_MAX)
-        self.CHLORAMINES_MAX = manager.get_threshold("HighChloraminesWater", "has_chloramines_value", DEFAULT_CHLORAMINES_MAX)
-        self.HARDNESS_LIMIT = manager.get_threshold("HardWater", "has_hardness_value", DEFAULT_HARDNESS_LIMIT)
-
-        # 4. Parametri Tossici/Biologici
-        self.ORGANIC_CARBON_MAX = manager.get_threshold("HighCarbonWater", "has_organic_carbon_value", DEFAULT_ORGANIC_CARBON_MAX)
-        self.THM_MAX = manager.get_threshold("HighTHMWater", "has_trihalomethanes_value", DEFAULT_THM_MAX)
-
-        self.PH_CORROSIVE_MAX = manager.get_threshold("CorrosiveWater", "has_ph_value", 6.0)
-        self.SULFATE_CORROSIVE_MIN = manager.get_threshold("CorrosiveWater", "has_sulfate_value", 200.0)
-        
-        # Debug per verificare cosa ha caricato (utile per l'esame)
-        print(f"\n[SISTEMA IBRIDO] Soglie Caricate:")
-        print(f"   -> pH Range: {self.PH_MIN} - {self.PH_MAX}")
-        print(f"   -> Solfati Max: {self.SULFATE_MAX}")
-        print(f"   -> Torbidità Max: {self.TURBIDITY_MAX}")
-        
     def notify(self, message, msg_type="info"):
         """Metodo da sovrascrivere nelle sottoclassi (CLI o GUI)"""
         pass
@@ -86,74 +213,74 @@ class BaseWaterExpert(KnowledgeEngine):
     @Rule(Fact(param='ph', value=MATCH.val))
     def check_ph(self, val):
         if val < self.PH_MIN:
-            self.notify(f"🔴 pH ACIDO rilevato (< {self.PH_MIN}). Corrosivo!", "error")
+            self.report("check_ph", f"🔴 pH ACIDO rilevato (< {self.PH_MIN}). Corrosivo!", "error", val)
             self.declare(Fact(problema_ph="acido"))
             self.problems_count += 1
         elif val > self.PH_MAX:
-            self.notify(f"🔴 pH BASICO rilevato (> {self.PH_MAX}).", "error")
+            self.report("check_ph", f"🔴 pH BASICO rilevato (> {self.PH_MAX}).", "error", val)
             self.declare(Fact(problema_ph="basico"))
             self.problems_count += 1
         else:
-            self.notify(f"✅ pH nella norma ({val}).", "success")
+            self.report("check_ph", f"✅ pH nella norma ({val}).", "success", val)
 
     @Rule(Fact(param='sulfate', value=MATCH.val))
     def check_sulfate(self, val):
         if val > self.SULFATE_MAX: # Dinamico
-            self.notify(f"⚠️ Solfati ALTI ({val} mg/L).", "warning")
+            self.report("check_sulfate", f"⚠️ Solfati ALTI ({val} mg/L).", "warning", val)
             self.declare(Fact(problema_solfati="alto"))
             self.problems_count += 1
         else:
-            self.notify("✅ Solfati nella norma.", "success")
+            self.report("check_sulfate", "✅ Solfati nella norma.", "success", val)
 
     @Rule(Fact(param='turbidity', value=MATCH.val))
     def check_turbidity(self, val):
         if val > self.TURBIDITY_MAX:
-            self.notify(f"🔴 Torbidità ALTA ({val} NTU). Acqua sporca.", "error")
+            self.report("check_turbidity", f"🔴 Torbidità ALTA ({val} NTU). Acqua sporca.", "error", val)
             self.declare(Fact(problema_torbidita="alta"))
             self.problems_count += 1
         else:
-            self.notify("✅ Torbidità nella norma.", "success")
+            self.report("check_turbidity", "✅ Torbidità nella norma.", "success", val)
     
         # 2. NUOVO: Controllo di Incongruenza (Spostato qui per valere per tutti)
         # Se l'utente dice "è torbida" ma il sensore dice "bassa", c'è qualcosa che non va.
         if self.facts.get(Fact(osservazione_torbida="si")) and val < 5.0:
-             self.notify("⚠️ INCONGRUENZA: Hai segnalato acqua torbida visivamente, ma il valore strumentale è basso. Verificare sensore.", "warning")
+             self.report("check_turbidity", "⚠️ INCONGRUENZA: Hai segnalato acqua torbida visivamente, ma il valore strumentale è basso. Verificare sensore.", "warning", val)
 
     @Rule(Fact(param='solids', value=MATCH.val))
     def check_solids(self, val):
         if val > self.SOLIDS_MAX:
-            self.notify(f"🔴 TDS Alto ({val} ppm). Acqua troppo mineralizzata.", "error")
+            self.report("check_solids", f"🔴 TDS Alto ({val} ppm). Acqua troppo mineralizzata.", "error", val)
             self.declare(Fact(problema_solidi="alto"))
             self.problems_count += 1
 
     @Rule(Fact(param='hardness', value=MATCH.val))
     def check_hardness(self, val):
         if val > self.HARDNESS_LIMIT:
-            self.notify(f"ℹ️ Acqua dura ({val} mg/L). Possibili incrostazioni.", "info")
+            self.report("check_hardness", f"ℹ️ Acqua dura ({val} mg/L). Possibili incrostazioni.", "info", val)
 
     @Rule(Fact(param='chloramines', value=MATCH.val))
     def check_chloramines(self, val):
         if val > self.CHLORAMINES_MAX:
-            self.notify(f"⚠️ Cloramine ALTE ({val} ppm). Sapore sgradevole/Rischio.", "warning")
+            self.report("check_chloramines", f"⚠️ Cloramine ALTE ({val} ppm). Sapore sgradevole/Rischio.", "warning", val)
             self.declare(Fact(problema_chimico="cloramine"))
             self.problems_count += 1
 
     @Rule(Fact(param='conductivity', value=MATCH.val))
     def check_conductivity(self, val):
         if val > self.CONDUCTIVITY_MAX:
-            self.notify(f"ℹ️ Conducibilità alta ({val}). Presenza di ioni disciolti.", "info")
+            self.report("check_conductivity", f"ℹ️ Conducibilità alta ({val}). Presenza di ioni disciolti.", "info", val)
 
     @Rule(Fact(param='organic_carbon', value=MATCH.val))
     def check_organic_carbon(self, val):
         if val > self.ORGANIC_CARBON_MAX:
-            self.notify(f"🔴 Carbonio Organico Alto ({val} ppm). Rischio biologico.", "error")
+            self.report("check_organic_carbon", f"🔴 Carbonio Organico Alto ({val} ppm). Rischio biologico.", "error", val)
             self.declare(Fact(problema_biologico="carbonio"))
             self.problems_count += 1
 
     @Rule(Fact(param='trihalomethanes', value=MATCH.val))
     def check_trihalomethanes(self, val):
         if val > self.THM_MAX:
-            self.notify(f"🔴 Trialometani PERICOLOSI ({val} ug/L). Cancerogeni.", "error")
+            self.report("check_trihalomethanes", f"🔴 Trialometani PERICOLOSI ({val} ug/L). Cancerogeni.", "error", val)
             self.declare(Fact(problema_tossico="thm"))
             self.problems_count += 1
 
@@ -163,7 +290,7 @@ class BaseWaterExpert(KnowledgeEngine):
     def corrosion_risk(self, ph_val, sulf_val):
         # Il controllo avviene QUI, usando le variabili dinamiche dell'istanza
         if ph_val < self.PH_CORROSIVE_MAX and sulf_val > self.SULFATE_CORROSIVE_MIN:
-            self.notify(f"🔥 COMBINAZIONE CRITICA: pH < {self.PH_CORROSIVE_MAX} e Solfati > {self.SULFATE_CORROSIVE_MIN}!", "error")
+            self.report("corrosion_risk", f"🔥 COMBINAZIONE CRITICA: pH < {self.PH_CORROSIVE_MAX} e Solfati > {self.SULFATE_CORROSIVE_MIN}!", "error")
             self.declare(Fact(problem_type="critical"))
             self.csp_suggestion = "critical"
 
@@ -182,13 +309,13 @@ class BaseWaterExpert(KnowledgeEngine):
 
     @Rule(Fact(osservazione_odore="si"))
     def check_bad_smell(self):
-        self.notify("⚠️ SEGNALAZIONE ODORE: Possibile contaminazione batterica o eccesso di cloro.", "warning")
+        self.report("check_bad_smell", "⚠️ SEGNALAZIONE ODORE: Possibile contaminazione batterica o eccesso di cloro.", "warning")
         # Opzionale: incrementa contatore problemi se vuoi essere severo
         # self.problems_count += 1 
 
     @Rule(Fact(osservazione_sapore="si"))
     def check_bad_taste(self):
-        self.notify("ℹ️ SEGNALAZIONE SAPORE: Sapore metallico rilevato. Controllare tubature o solfati.", "info")
+        self.report("check_bad_taste", "ℹ️ SEGNALAZIONE SAPORE: Sapore metallico rilevato. Controllare tubature o solfati.", "info")
 
 
 # ==============================================================================
@@ -200,8 +327,10 @@ class WaterExpert(BaseWaterExpert):
     """
     @DefFacts()
     def _load_data(self):
-        # Carica le medie solo per la CLI se servono
-        self.mean_water_values = waterData().get_medium_values_water()
+        # Carica le medie solo per la CLI se servono (dall'indice delle statistiche su disco),
+        # una sola volta per istanza: i reset successivi non rileggono il disco
+        if getattr(self, "mean_water_values", None) is None:
+            self.mean_water_values = get_reference_values()
         yield Fact(mode="cli")
 
     def notify(self, message, msg_type="info"):
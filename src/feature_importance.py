@@ -0,0 +1,173 @@
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+from sklearn.pipeline import Pipeline
+from joblib import Parallel, delayed
+from scipy import stats
+import numpy as np
+import tempfile
+import time
+
+from .data_loader import FEATURES
+from .ml_models import waterModel, predict_labels_proba
+from .parallel_cv import _share_array
+
+SCORERS = {
+    "Accuracy": accuracy_score,
+    "Precision": lambda y, p: precision_score(y, p, zero_division=0),
+    "Recall": lambda y, p: recall_score(y, p, zero_division=0),
+    "F1": lambda y, p: f1_score(y, p, zero_division=0),
+}
+
+# Step di preprocessing che agiscono colonna per colonna: permutare la colonna
+# trasformata equivale a permutare quella grezza e poi trasformarla
+COLUMNWISE_STEPS = ("SimpleImputer", "StandardScaler", "runningMeanImputer", "runningStandardScaler")
+
+# Buffer di lavoro del processo (uno per matrice condivisa), riusato tra i task
+_buffers = {}
+_buffers_run = None
+
+
+def _work_buffer(run_id: str, name: str, x):
+    """Copia privata e scrivibile della matrice, allocata una sola volta per processo e per run."""
+    global _buffers_run
+    if _buffers_run != run_id:
+        _buffers.clear()
+        _buffers_run = run_id
+    if name not in _buffers:
+        _buffers[name] = np.array(x)
+    return _buffers[name]
+
+
+def _predict(estimator, x):
+    """Etichette come nel record di valutazione (argmax di predict_proba se disponibile)."""
+    if hasattr(estimator, "predict_proba"):
+        return predict_labels_proba(estimator, x)[0]
+    return estimator.predict(x)
+
+
+def _split_estimator(model: waterModel):
+    """
+    Matrice di test da permutare e stimatore da applicare. Se il preprocessing
+    è colonna per colonna, il test set si trasforma una sola volta e i task
+    eseguono solo il classificatore finale.
+    """
+    pipeline = model.model
+    x_test = model.x_test
+    if not isinstance(pipeline, Pipeline):
+        return np.asarray(x_test), pipeline
+    if len(pipeline.steps) == 1:
+        # Nessun preprocessing (es. Gradient Boosting con NaN nativi): solo lo stimatore
+        return np.asarray(x_test), pipeline.steps[-1][1]
+    if all(type(step).__name__ in COLUMNWISE_STEPS for _, step in pipeline.steps[:-1]):
+        return pipeline[:-1].transform(x_test), pipeline.steps[-1][1]
+    return np.asarray(x_test), pipeline
+
+
+def _run_permutation(run_id: str, name: str, estimator, x, y_true, feature: int, repeat: int,
+                     seed: int, scoring: str):
+    """
+    Task eseguito nel worker: permuta una colonna nel buffer del processo,
+    calcola il punteggio e ripristina la colonna originale.
+    """
+    buffer = _work_buffer(run_id, name, x)
+    rng = np.random.default_rng([seed, feature, repeat])
+    buffer[:, feature] = x[rng.permutation(len(x)), feature]
+    try:
+        score = SCORERS[scoring](y_true, _predict(estimator, buffer))
+    finally:
+        buffer[:, feature] = x[:, feature]
+    return name, feature, repeat, score
+
+
+def run_permutation_importance(models: dict, n_repeats: int = 10, scoring: str = "Accuracy",
+                               confidence: float = 0.95, n_jobs: int = -1, features: list = None) -> dict:
+    """
+    Importanza per permutazione delle feature per uno o più waterModel già addestrati,
+    sul test set condiviso. Ogni coppia (feature, ripetizione) di ogni modello è un
+    task del pool; il punteggio di riferimento viene dal record di valutazione del
+    modello (nessuna nuova previsione). L'importanza è il calo del punteggio quando
+    la colonna viene permutata; l'intervallo di confidenza usa la t di Student
+    sulle ripetizioni.
+    features: sottoinsieme di FEATURES da valutare (default: tutte).
+    """
+    features = list(features or FEATURES)
+    unknown = [f for f in features if f not in FEATURES]
+    if unknown:
+        raise ValueError(f"Feature sconosciute: {', '.join(unknown)} (ammesse: {', '.join(FEATURES)})")
+    # Colonna del dataset da permutare per ogni feature richiesta
+    columns = [FEATURES.index(f) for f in features]
+    baselines, matrices, estimators, labels = {}, {}, {}, {}
+    for name, model in models.items():
+        evaluation = model.get_evaluation()
+        if evaluation is None:
+            raise ValueError(f"Modello '{name}' non addestrato: eseguire prima predict().")
+        labels[name] = evaluation["y_true"]
+        baselines[name] = SCORERS[scoring](labels[name], evaluation["labels"])
+        matrices[name], estimators[name] = _split_estimator(model)
+
+    seed = next(iter(models.values())).provider.seed
+    scores = {name: np.empty((len(features), n_repeats)) for name in models}
+    with tempfile.TemporaryDirectory() as folder:
+        shared = {name: _share_array(x, folder, f"x_{i}") for i, (name, x) in enumerate(matrices.items())}
+
+        start = time.perf_counter()
+        # Task raggruppati per modello: un worker tende a restare sullo stesso buffer
+        stream = Parallel(n_jobs=n_jobs, return_as="generator_unordered")(
+            delayed(_run_permutation)(folder, name, estimators[name], shared[name], labels[name],
+                                      column, r, seed, scoring)
+            for name in models for column in columns for r in range(n_repeats)
+        )
+        for name, column, repeat, score in stream:
+            scores[name][columns.index(column), repeat] = score
+        wall_time = time.perf_counter() - start
+    _buffers.clear()
+
+    t = stats.t.ppf(0.5 + confidence / 2, df=max(n_repeats - 1, 1))
+    importances = {}
+    for name in models:
+        drops = baselines[name] - scores[name]
+        mean = drops.mean(axis=1)
+        std = drops.std(axis=1, ddof=1) if n_repeats > 1 else np.zeros(len(features))
+        half_width = t * std / np.sqrt(n_repeats)
+        importances[name] = {
+            feature: {"mean": float(mean[j]), "std": float(std[j]),
+                      "ci_low": float(mean[j] - half_width[j]), "ci_high": float(mean[j] + half_width[j])}
+            for j, feature in enumerate(features)
+        }
+
+    return {"importances": importances, "baselines": baselines, "scoring": scoring,
+            "n_repeats": n_repeats, "confidence": confidence, "wall_time": wall_time}
+
+
+def print_importances(report: dict):
+    """Stampa a video le importanze di ogni modello, dalla più alta alla più bassa."""
+    level = f"{report['confidence'] * 100:.0f}%"
+    for name, importances in report["importances"].items():
+        print(f"\n--- {name} ({report['scoring']} di riferimento: {report['baselines'][name]:.4f}) ---")
+        print(f"   {'FEATURE':<18} | {'CALO MEDIO':>10} | IC {level}")
+        for feature, imp in sorted(importances.items(), key=lambda item: -item[1]["mean"]):
+            print(f"   {feature:<18} | {imp['mean']:>10.4f} | [{imp['ci_low']:+.4f}, {imp['ci_high']:+.4f}]")
+    print(f"\nTempo reale: {report['wall_time']:.1f}s ({report['n_repeats']} ripetizioni per feature)")
+
+
+def plot_importances(report: dict, path: str = None) -> Figure:
+    """Grafico a barre orizzontali (backend Agg) con intervalli di confidenza, un pannello per modello."""
+    names = list(report["importances"])
+    fig = Figure(figsize=(5 * len(names), 4.5))
+    FigureCanvasAgg(fig)
+    axes = np.atleast_1d(fig.subplots(1, len(names), sharex=True))
+    for ax, name in zip(axes, names):
+        ordered = sorted(report["importances"][name].items(), key=lambda item: item[1]["mean"])
+        means = np.array([imp["mean"] for _, imp in ordered])
+        errors = np.array([[imp["mean"] - imp["ci_low"] for _, imp in ordered],
+                           [imp["ci_high"] - imp["mean"] for _, imp in ordered]])
+        ax.barh([feature for feature, _ in ordered], means, xerr=errors, color="steelblue", capsize=3)
+        ax.axvline(0, color="black", lw=0.8)
+        ax.set_title(name)
+        ax.set_xlabel(f"Calo di {report['scoring']}")
+        ax.grid(axis="x", alpha=0.3)
+    fig.tight_layout()
+    if path is not None:
+        fig.savefig(path, dpi=120)
+    return fig
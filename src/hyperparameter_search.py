@@ -0,0 +1,231 @@
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+from sklearn.model_selection import train_test_split
+from sklearn.base import clone
+from joblib import Parallel, delayed
+import numpy as np
+import itertools
+import tempfile
+import math
+import time
+
+from .data_loader import waterData
+from .ml_models import (waterModel, waterLogReg, waterDecTree, waterKnn,
+                        waterNeuralNetwork, waterNaiveBayes, waterHistGradientBoosting)
+from .split_provider import get_split_provider
+from .parallel_cv import _share_array
+
+# Spazio di ricerca per famiglia: argomenti del costruttore del waterModel
+# oppure parametri della Pipeline ("clf__..."), impostati con set_params.
+SEARCH_SPACES = {
+    "Logistic Regression": (waterLogReg, {
+        "clf__C": [0.01, 0.1, 1.0, 10.0],
+        "clf__class_weight": ["balanced", None],
+    }),
+    "Decision Tree": (waterDecTree, {
+        "max_depth": [3, 5, 7, 10, 15],
+        "clf__min_samples_leaf": [1, 5, 20],
+    }),
+    "KNN": (waterKnn, {
+        "neighbors": [3, 5, 7, 11, 15, 21, 31],
+        "clf__weights": ["uniform", "distance"],
+    }),
+    "Neural Network": (waterNeuralNetwork, {
+        "hidden_layers": [(32,), (64, 32), (100, 50, 20)],
+        "clf__alpha": [1e-4, 1e-3, 1e-2],
+    }),
+    "Naive Bayes": (waterNaiveBayes, {
+        "clf__var_smoothing": [1e-9, 1e-8, 1e-7, 1e-6, 1e-5],
+    }),
+    "Gradient Boosting": (waterHistGradientBoosting, {
+        "learning_rate": [0.03, 0.1, 0.3],
+        "max_leaf_nodes": [15, 31, 63],
+        "clf__l2_regularization": [0.0, 1.0],
+    }),
+}
+
+# Famiglie iterative: oltre alle righe, anche max_iter cresce con il budget del turno
+ITERATIVE_RESOURCES = {"Logistic Regression": 1000, "Neural Network": 1000, "Gradient Boosting": 200}
+
+
+def _grid(space: dict, max_configs: int, rng) -> list:
+    """Configurazioni della griglia in ordine casuale (riproducibile), al massimo max_configs."""
+    names = list(space)
+    configs = [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+    order = rng.permutation(len(configs))[:max_configs]
+    return [configs[i] for i in order]
+
+
+def _split_config(config: dict):
+    """Separa gli argomenti del costruttore dai parametri della Pipeline."""
+    ctor = {k: v for k, v in config.items() if not k.startswith("clf__")}
+    pipeline_params = {k: v for k, v in config.items() if k.startswith("clf__")}
+    return ctor, pipeline_params
+
+
+def build_model(data: waterData, test_size: float, family: str, config: dict,
+                use_registry: bool = True) -> waterModel:
+    """
+    Costruisce il waterModel della famiglia con la configurazione data.
+    I parametri della Pipeline entrano negli iperparametri, quindi anche nella
+    chiave del registro: la ricerca nel registro si fa dopo averli impostati.
+    """
+    model_class, _ = SEARCH_SPACES[family]
+    ctor, pipeline_params = _split_config(config)
+    model = model_class(data, test_size, use_registry=False, **ctor)
+    if pipeline_params:
+        model.model.set_params(**pipeline_params)
+        model.hyperparams.update(pipeline_params)
+    if use_registry:
+        model.use_registry = True
+        model._split(model.provider)
+    return model
+
+
+def _run_trial(trial_id: int, pipeline, x, y, train_idx, val_idx):
+    """Task eseguito nel worker: una configurazione su un sottoinsieme del train set."""
+    start = time.perf_counter()
+    pipeline.fit(x[train_idx], y[train_idx].ravel())
+    fit_time = time.perf_counter() - start
+
+    y_true = y[val_idx].ravel()
+    y_pred = pipeline.predict(x[val_idx])
+    return trial_id, {
+        'Accuracy': accuracy_score(y_true, y_pred),
+        'Precision': precision_score(y_true, y_pred, zero_division=0),
+        'Recall': recall_score(y_true, y_pred, zero_division=0),
+        'F1': f1_score(y_true, y_pred, zero_division=0),
+        'fit_time': fit_time
+    }
+
+
+def successive_halving_search(data: waterData, test_size: float = 0.2, families: list = None,
+                              budget_seconds: float = 120.0, eta: int = 3, min_fraction: float = 1 / 9,
+                              max_configs: int = 27, scoring: str = "Accuracy", validation_size: float = 0.25,
+                              n_jobs: int = -1, callback=None) -> dict:
+    """
+    Ricerca degli iperparametri a dimezzamenti successivi (successive halving)
+    per tutte le famiglie insieme, su un pool di processi.
+
+    Al primo turno ogni configurazione è addestrata su una frazione min_fraction
+    del train set (e, per LR/MLP, con max_iter ridotto nella stessa proporzione);
+    a ogni turno sopravvive 1/eta delle configurazioni di ogni famiglia e la
+    risorsa cresce di eta volte, fino al train set completo. Le configurazioni
+    sono valutate su una parte di validazione ricavata dal solo train set:
+    il test set resta intatto per la valutazione finale.
+
+    Se il tempo (budget_seconds) finisce, la ricerca si ferma e per ogni famiglia
+    vince la configurazione migliore del turno più avanzato raggiunto.
+    Il budget vale per la sola ricerca: l'addestramento finale dei vincitori sul
+    train set completo viene eseguito comunque (tempo in "final_seconds").
+    callback(trial), se indicato, riceve ogni prova completata.
+    """
+    start = time.perf_counter()
+    families = families or list(SEARCH_SPACES)
+    provider = get_split_provider(data)
+    rng = np.random.default_rng(provider.seed)
+
+    train_idx, _ = provider.get_split(test_size)
+    search_idx, val_idx = train_test_split(train_idx, test_size=validation_size,
+                                           stratify=provider.labels[train_idx], random_state=provider.seed)
+    # Sottoinsiemi annidati: le righe del turno r sono contenute in quelle del turno r+1
+    search_idx = rng.permutation(search_idx)
+
+    n_rungs = int(math.floor(math.log(1 / min_fraction, eta) + 1e-9)) + 1
+    candidates = {}
+    for family in families:
+        _, space = SEARCH_SPACES[family]
+        for config in _grid(space, max_configs, rng):
+            template = build_model(data, test_size, family, config, use_registry=False).model
+            candidates.setdefault(family, []).append((config, template))
+
+    history = []
+    best = {}
+    budget_exhausted = False
+    with tempfile.TemporaryDirectory() as folder:
+        x = _share_array(provider.x, folder, "x")
+        y = _share_array(provider.y, folder, "y")
+
+        for rung in range(n_rungs):
+            fraction = min(1.0, min_fraction * eta ** rung)
+            rows = search_idx[:max(int(len(search_idx) * fraction), eta * 10)]
+
+            trials = []
+            for family, configs in candidates.items():
+                for config, template in configs:
+                    pipeline = clone(template)
+                    if family in ITERATIVE_RESOURCES:
+                        pipeline.set_params(clf__max_iter=max(10, int(ITERATIVE_RESOURCES[family] * fraction)))
+                    trials.append((family, config, template, pipeline))
+
+            scored = {family: [] for family in candidates}
+            stream = Parallel(n_jobs=n_jobs, return_as="generator_unordered")(
+                delayed(_run_trial)(i, pipeline, x, y, rows, val_idx)
+                for i, (_, _, _, pipeline) in enumerate(trials)
+            )
+            try:
+                for trial_id, result in stream:
+                    family, config, template, _ = trials[trial_id]
+                    trial = {"family": family, "params": config, "rung": rung, "fraction": fraction,
+                             "rows": len(rows), "score": result[scoring], "fit_time": result["fit_time"]}
+                    history.append(trial)
+                    scored[family].append((result[scoring], trial_id, config, template))
+                    if callback is not None:
+                        callback(trial)
+                    if time.perf_counter() - start > budget_seconds:
+                        budget_exhausted = True
+                        break
+            finally:
+                # Chiudere il generatore annulla i task ancora in coda e attende quelli
+                # in esecuzione, prima che la cartella dei memmap venga cancellata
+                stream.close()
+
+            for family, results in scored.items():
+                if not results:
+                    continue
+                # A parità di punteggio vince l'ordine della griglia (i risultati arrivano non ordinati)
+                results.sort(key=lambda r: (-r[0], r[1]))
+                best[family] = {"params": results[0][2], "score": results[0][0], "rung": rung, "fraction": fraction}
+                candidates[family] = [(config, template) for _, _, config, template in
+                                      results[:max(1, math.ceil(len(results) / eta))]]
+
+            candidates = {family: configs for family, configs in candidates.items() if scored[family]}
+            if budget_exhausted:
+                break
+
+    search_seconds = time.perf_counter() - start
+
+    # Modello finale per famiglia: configurazione vincente addestrata su tutto il train set.
+    # Questo passo è fuori dal budget: viene eseguito anche se il tempo è esaurito.
+    for family, entry in best.items():
+        entry["model"] = build_model(data, test_size, family, entry["params"])
+        entry["model"].predict()
+
+    return {
+        "best": best,
+        "history": history,
+        "trials": len(history),
+        "rungs": n_rungs,
+        "seconds": time.perf_counter() - start,
+        "search_seconds": search_seconds,
+        "final_seconds": time.perf_counter() - start - search_seconds,
+        "budget_seconds": budget_seconds,
+        "budget_exhausted": budget_exhausted,
+        "scoring": scoring,
+    }
+
+
+def print_search_report(report: dict):
+    """Stampa a video la configurazione migliore per famiglia."""
+    print("\n" + "=" * 110)
+    print(f"{'FAMIGLIA':<22} | {'VALID. ' + report['scoring']:<16} | {'TEST ACC.':<9} | {'TURNO':<7} | PARAMETRI")
+    print("-" * 110)
+    for family, entry in report["best"].items():
+        params = ", ".join(f"{k}={v}" for k, v in entry["params"].items())
+        print(f"{family:<22} | {entry['score']:<16.4f} | {entry['model'].get_metric('Accuracy'):<9.4f} | "
+              f"{entry['rung'] + 1}/{report['rungs']:<5} | {params}")
+    print("=" * 110)
+    status = "budget di tempo esaurito" if report["budget_exhausted"] else "completata"
+    print(f"Ricerca {status}: {report['trials']} prove in {report['search_seconds']:.1f}s "
+          f"(budget {report['budget_seconds']:.0f}s)")
+    print(f"Addestramento finale dei vincitori (fuori budget): {report['final_seconds']:.1f}s "
+          f"| totale {report['seconds']:.1f}s")
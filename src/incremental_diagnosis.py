@@ -0,0 +1,192 @@
+from collections import Counter
+
+from .expert_system import BaseWaterExpert, Fact, PARAM_COLUMNS
+from experta.factlist import FactList
+
+# Osservazioni lette dalle regole fuori dai pattern (self.facts.get):
+# se cambiano, il parametro indicato va ridichiarato per rieseguire la regola
+IMPLICIT_DEPENDENCIES = {"osservazione_torbida": "turbidity"}
+
+CSP_RULES = ("chemical", "physical")
+
+
+def _finding_key(finding: dict):
+    return finding["rule"], finding["type"], finding["message"]
+
+
+def _missing_from(findings: list, reference: list) -> list:
+    """Esiti di 'findings' assenti da 'reference' (confronto come multiinsieme)."""
+    available = Counter(map(_finding_key, reference))
+    missing = []
+    for finding in findings:
+        key = _finding_key(finding)
+        if available[key] > 0:
+            available[key] -= 1
+        else:
+            missing.append(finding)
+    return missing
+
+
+class diagnosisSession(BaseWaterExpert):
+    """
+    Sessione di diagnosi incrementale: la memoria di lavoro del motore resta tra
+    un'analisi e la successiva. A ogni update() si ritirano e ridichiarano solo i
+    fatti dei parametri cambiati; i fatti derivati (problema_*, need_lab, ...) sono
+    tracciati per attivazione e ritirati a cascata quando cade il fatto da cui
+    dipendono, così scattano solo le regole interessate (es. check_ph e corrosion_risk).
+
+    problems_count e csp_suggestion sono ricalcolati dalle attivazioni ancora valide,
+    con lo stesso esito di un'analisi completa nell'ordine di PARAM_COLUMNS:
+    'critical' domina, altrimenti vince l'intervento del primo parametro problematico.
+    """
+
+    def __init__(self, verbose: bool = False, thresholds: dict = None):
+        super().__init__(verbose, thresholds)
+        self._clear_session()
+
+    def _clear_session(self):
+        self._records = {}       # attivazioni eseguite e ancora valide: seq -> record
+        self._content_ids = {}   # contenuto di un fatto derivato -> id del fatto
+        self._producer = {}      # id del fatto derivato -> seq dell'attivazione
+        self._params = {}        # parametro -> fatto dichiarato
+        self._observations = {}  # osservazione -> fatto dichiarato
+        self._current = None
+        self._seq = 0
+        self._fired = 0
+
+    def reset(self, **kwargs):
+        super().reset(**kwargs)
+        self._clear_session()
+
+    def declare(self, *facts):
+        """Come declare(), ma i fatti dichiarati da una regola sono attribuiti alla sua attivazione."""
+        if self._current is None:
+            return super().declare(*facts)
+        inserted = None
+        for fact in facts:
+            content = FactList._get_fact_id(fact)
+            self._current["intends"].append(content)
+            inserted = super().declare(fact)
+            if inserted is not None:
+                self._content_ids[content] = inserted["__factid__"]
+                self._producer[inserted["__factid__"]] = self._current["seq"]
+        return inserted
+
+    def _fire(self, activation):
+        """Esegue l'attivazione registrandone fatti dichiarati, esiti e contributo ai contatori."""
+        self._seq += 1
+        self._fired += 1
+        record = {"seq": self._seq, "rule": activation.rule.__name__, "intends": [],
+                  "facts": tuple(f["__factid__"] for f in activation.facts)}
+        self._current = record
+        problems, findings = self.problems_count, len(self.findings)
+        # Senza un valore precedente la regola registra l'intervento che suggerisce
+        self.csp_suggestion = None
+        try:
+            super()._fire(activation)
+        finally:
+            self._current = None
+        record["problems"] = self.problems_count - problems
+        record["findings"] = self.findings[findings:]
+        record["csp"] = self.csp_suggestion
+        self._records[record["seq"]] = record
+
+    def _retract_cascade(self, fact_ids: set):
+        """Ritira i fatti indicati e, a cascata, le attivazioni che ne dipendono e i loro fatti derivati."""
+        queue = list(fact_ids)
+        for fact_id in queue:
+            self.retract(fact_id)
+        while queue:
+            fallen = set(queue)
+            queue = []
+            dead = [seq for seq, record in self._records.items() if fallen.intersection(record["facts"])]
+            for seq in dead:
+                record = self._records.pop(seq)
+                for content in record["intends"]:
+                    if content not in self._content_ids:
+                        continue
+                    fact_id = self._content_ids[content]
+                    supporters = [r["seq"] for r in self._records.values() if content in r["intends"]]
+                    if supporters:
+                        # Il fatto resta: lo sostiene un'altra attivazione ancora valida
+                        self._producer[fact_id] = supporters[0]
+                        continue
+                    del self._content_ids[content]
+                    self._producer.pop(fact_id, None)
+                    if fact_id in self.facts:
+                        self.retract(fact_id)
+                        queue.append(fact_id)
+
+    def _root_position(self, fact_id: int, positions: dict) -> float:
+        """Posizione nell'ordine di PARAM_COLUMNS del primo parametro da cui deriva un fatto."""
+        if fact_id in positions:
+            return positions[fact_id]
+        seq = self._producer.get(fact_id)
+        if seq is None or seq not in self._records:
+            return float("inf")
+        return min((self._root_position(f, positions) for f in self._records[seq]["facts"]), default=float("inf"))
+
+    def _recompute(self):
+        """problems_count, csp_suggestion e record della diagnosi dalle sole attivazioni valide."""
+        records = sorted(self._records.values(), key=lambda r: r["seq"])
+        self.problems_count = sum(r["problems"] for r in records)
+        self.findings = [finding for r in records for finding in r["findings"]]
+
+        suggestions = [r for r in records if r["csp"]]
+        if any(r["csp"] == "critical" for r in suggestions):
+            self.csp_suggestion = "critical"
+        else:
+            order = list(PARAM_COLUMNS)
+            positions = {fact["__factid__"]: order.index(param) for param, fact in self._params.items()}
+            candidates = [r for r in suggestions if r["csp"] in CSP_RULES]
+            # In un'analisi completa scatta per ultima l'inferenza del primo parametro dichiarato
+            winner = min(candidates, default=None,
+                         key=lambda r: min((self._root_position(f, positions) for f in r["facts"]),
+                                           default=float("inf")))
+            self.csp_suggestion = winner["csp"] if winner else None
+
+    def update(self, sample: dict, observations=()) -> dict:
+        """
+        Nuova analisi nella sessione. Alla prima chiamata esegue la diagnosi completa;
+        poi ritira e ridichiara solo i parametri (e le osservazioni) cambiati.
+        Restituisce la diagnosis come diagnose() più le differenze rispetto alla precedente:
+        parametri cambiati, esiti aggiunti e rimossi, regole eseguite.
+        """
+        if not self.facts:
+            self.reset()
+        before = self.get_diagnosis()
+        self._fired = 0
+
+        values = {param: float(sample[param]) for param in PARAM_COLUMNS
+                  if sample.get(param) is not None and sample[param] == sample[param]}
+        changed = [param for param in PARAM_COLUMNS
+                   if values.get(param) != (self._params[param]["value"] if param in self._params else None)]
+        wanted = set(observations)
+        changed_observations = sorted(wanted.symmetric_difference(self._observations))
+        for observation in changed_observations:
+            dependent = IMPLICIT_DEPENDENCIES.get(observation)
+            if dependent in values and dependent not in changed:
+                changed.append(dependent)
+
+        stale = {self._params.pop(param)["__factid__"] for param in changed if param in self._params}
+        stale |= {self._observations.pop(o)["__factid__"] for o in changed_observations if o in self._observations}
+        if stale:
+            self._retract_cascade(stale)
+
+        # Stesso ordine di diagnose(): parametri (ordine di PARAM_COLUMNS), poi osservazioni
+        for param in (p for p in PARAM_COLUMNS if p in changed and p in values):
+            self._params[param] = self.declare(Fact(param=param, value=values[param]))
+        for observation in (o for o in changed_observations if o in wanted):
+            self._observations[observation] = self.declare(Fact(**{observation: "si"}))
+        self.run()
+        self._recompute()
+
+        diagnosis = self.get_diagnosis()
+        diagnosis.update({
+            "changed": changed + changed_observations,
+            "added": _missing_from(diagnosis["findings"], before["findings"]),
+            "removed": _missing_from(before["findings"], diagnosis["findings"]),
+            "fired": self._fired,
+            "previous": {"problems_count": before["problems_count"], "csp_suggestion": before["csp_suggestion"]},
+        })
+        return diagnosis
@@ -0,0 +1,166 @@
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from sklearn.metrics import accuracy_score
+from sklearn.base import clone
+from joblib import Parallel, delayed
+import numpy as np
+import tracemalloc
+import tempfile
+import time
+
+from .ml_models import waterModel
+from .parallel_cv import _share_array
+
+
+def geometric_sizes(n_train: int, min_size: int = 100, steps: int = 6) -> list:
+    """Dimensioni del train set in progressione geometrica, da min_size a n_train."""
+    sizes = np.geomspace(min(min_size, n_train), n_train, steps).astype(int)
+    return sorted(set(sizes.tolist()))
+
+
+def _run_step(name: str, fold: int, size: int, pipeline, x, y, train_idx, test_idx, trace_memory: bool):
+    """
+    Task eseguito nel worker: addestra la Pipeline completa sulle prime 'size'
+    righe del fold e ne misura accuratezza e tempo di fit. Con trace_memory un
+    secondo fit, sotto tracemalloc, misura il picco di memoria allocata: il
+    tracciamento rallenta il fit, quindi non si usa per il tempo.
+    """
+    x_train, y_train = x[train_idx], y[train_idx].ravel()
+    start = time.perf_counter()
+    fitted = clone(pipeline).fit(x_train, y_train)
+    fit_time = time.perf_counter() - start
+    result = {"accuracy": accuracy_score(y[test_idx].ravel(), fitted.predict(x[test_idx])), "fit_time": fit_time}
+
+    if trace_memory:
+        tracemalloc.start()
+        clone(pipeline).fit(x_train, y_train)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["peak_memory_mb"] = peak / 2 ** 20
+    return name, fold, size, result
+
+
+def run_learning_curve(models: dict, folds: int = 5, sizes: list = None, n_jobs: int = -1,
+                       callback=None) -> dict:
+    """
+    Curva di apprendimento di più modelli in parallelo sui fold condivisi del provider:
+    ogni terna (modello, fold, dimensione) è un task del pool. I sottoinsiemi del train
+    di un fold sono annidati (stessa permutazione), quindi i passi sono confrontabili.
+    Il picco di memoria è misurato sul primo fold.
+    callback(name, fold, size, result, completati, totali), se indicato, riceve ogni passo.
+
+    Le dimensioni richieste oltre il train set del fold più piccolo vengono ridotte
+    a quella: "sizes" riporta quelle effettivamente usate ("requested_sizes" le originali).
+
+    Per ogni modello restituisce medie e deviazioni standard su fold di accuratezza
+    e tempo di fit, il picco di memoria per passo e l'esponente di crescita del tempo di fit
+    (pendenza in scala log-log) utile a stimare i tempi su dataset più grandi.
+    """
+    first: waterModel = next(iter(models.values()))
+    provider = first.provider
+    fold_indices = provider.get_folds(folds)
+    rng = np.random.default_rng(provider.seed)
+    max_size = min(len(train_idx) for train_idx, _ in fold_indices)
+    requested_sizes = None
+    if sizes is None:
+        sizes = geometric_sizes(max_size)
+    else:
+        requested_sizes = [int(size) for size in sizes]
+        if any(size < 1 for size in requested_sizes):
+            raise ValueError(f"Dimensioni del train set non valide: {requested_sizes} (devono essere >= 1)")
+        # Oltre il train set del fold più piccolo non ci sono righe: si usa tutto il train
+        sizes = sorted(set(min(size, max_size) for size in requested_sizes))
+        if sizes != sorted(set(requested_sizes)):
+            print(f"[WARN] Dimensioni ridotte al train set del fold più piccolo ({max_size} righe): "
+                  f"usate {sizes}")
+
+    tasks = []
+    for i, (train_idx, test_idx) in enumerate(fold_indices):
+        order = rng.permutation(train_idx)
+        for size in sizes:
+            for name, model in models.items():
+                tasks.append((name, i, size, clone(model.model), order[:size], test_idx, i == 0))
+
+    raw = {name: {} for name in models}
+    with tempfile.TemporaryDirectory() as folder:
+        x = _share_array(first.x, folder, "x")
+        y = _share_array(first.y, folder, "y")
+
+        start = time.perf_counter()
+        stream = Parallel(n_jobs=n_jobs, return_as="generator_unordered")(
+            delayed(_run_step)(name, i, size, pipeline, x, y, train_rows, test_idx, trace)
+            for name, i, size, pipeline, train_rows, test_idx, trace in tasks
+        )
+        for done, (name, fold, size, result) in enumerate(stream, 1):
+            raw[name][(fold, size)] = result
+            if callback is not None:
+                callback(name, fold, size, result, done, len(tasks))
+        wall_time = time.perf_counter() - start
+
+    curves = {}
+    for name in models:
+        curve = {"sizes": list(sizes)}
+        for metric in ("accuracy", "fit_time"):
+            values = np.array([[raw[name][(fold, size)][metric] for fold in range(folds)] for size in sizes])
+            curve[f"{metric}_mean"] = values.mean(axis=1).tolist()
+            curve[f"{metric}_std"] = values.std(axis=1).tolist()
+        curve["peak_memory_mb"] = [raw[name][(0, size)]["peak_memory_mb"] for size in sizes]
+        times = np.maximum(curve["fit_time_mean"], 1e-9)
+        curve["fit_time_exponent"] = float(np.polyfit(np.log(sizes), np.log(times), 1)[0]) if len(sizes) > 1 else float("nan")
+        curves[name] = curve
+
+    return {"curves": curves, "folds": folds, "sizes": list(sizes), "requested_sizes": requested_sizes,
+            "wall_time": wall_time}
+
+
+def estimate_fit_time(curve: dict, rows: int) -> float:
+    """Tempo di fit stimato per 'rows' righe, estrapolando la legge di potenza della curva."""
+    return curve["fit_time_mean"][-1] * (rows / curve["sizes"][-1]) ** curve["fit_time_exponent"]
+
+
+def plot_learning_curves(report: dict, path: str = None) -> Figure:
+    """
+    Grafico (backend Agg, senza finestre) di accuratezza, tempo di fit e memoria
+    al crescere del train set. Se 'path' è indicato, salva anche il PNG.
+    """
+    fig = Figure(figsize=(15, 4.5))
+    FigureCanvasAgg(fig)
+    ax_acc, ax_time, ax_mem = fig.subplots(1, 3)
+    for name, curve in report["curves"].items():
+        sizes = np.array(curve["sizes"])
+        mean, std = np.array(curve["accuracy_mean"]), np.array(curve["accuracy_std"])
+        ax_acc.plot(sizes, mean, marker="o", label=name)
+        ax_acc.fill_between(sizes, mean - std, mean + std, alpha=0.15)
+        ax_time.plot(sizes, curve["fit_time_mean"], marker="o", label=f"{name} (~n^{curve['fit_time_exponent']:.2f})")
+        ax_mem.plot(sizes, curve["peak_memory_mb"], marker="o", label=name)
+
+    ax_acc.set_title(f"Accuracy ({report['folds']}-fold)")
+    ax_acc.set_ylabel("Accuracy")
+    ax_time.set_title("Tempo di fit")
+    ax_time.set_ylabel("Secondi")
+    ax_time.set_yscale("log")
+    ax_mem.set_title("Picco di memoria (fit)")
+    ax_mem.set_ylabel("MB")
+    for ax in (ax_acc, ax_time, ax_mem):
+        ax.set_xscale("log")
+        ax.set_xlabel("Righe di training")
+        ax.grid(alpha=0.3)
+        ax.legend(fontsize=7)
+    fig.tight_layout()
+    if path is not None:
+        fig.savefig(path, dpi=120)
+    return fig
+
+
+def print_learning_curves(report: dict):
+    """Stampa a video la tabella della curva di apprendimento."""
+    print("\n" + "=" * 86)
+    print(f"{'MODELLO':<22} | {'RIGHE':>6} | {'ACCURACY':>15} | {'FIT (s)':>9} | {'PICCO (MB)':>10} | ESPONENTE")
+    print("-" * 86)
+    for name, curve in report["curves"].items():
+        for j, size in enumerate(curve["sizes"]):
+            exponent = f"n^{curve['fit_time_exponent']:.2f}" if j == 0 else ""
+            print(f"{name:<22} | {size:>6} | {curve['accuracy_mean'][j]:.3f} ± {curve['accuracy_std'][j]:.3f} | "
+                  f"{curve['fit_time_mean'][j]:>9.4f} | {curve['peak_memory_mb'][j]:>10.2f} | {exponent}")
+    print("=" * 86)
+    print(f"Tempo reale: {report['wall_time']:.1f}s")
@@ -3,6 +3,9 @@ from numpy import linspace
 import matplotlib.pyplot as plt
 
 from .data_loader import waterData 
+from .parallel_cv import run_parallel_cv, print_speedup
+from .split_provider import get_split_provider, preprocessing_steps, apply_transformers
+import time
 
 def get_linspace(start: int, end: int, step: int):
     linspace_vect = []
@@ -11,33 +14,121 @@ def get_linspace(start: int, end: int, step: int):
     return linspace_vect
 
 
+# --- SWEEP INCREMENTALI DEGLI IPERPARAMETRI ---
+# Tutti i punti della griglia usano lo stesso split (e lo stesso preprocessing),
+# così le curve sono confrontabili e il costo è quello di un solo addestramento.
+
+def _sweep_matrices(data: waterData, test_size: float, prototype: waterModel):
+    """Matrici di train/test già preprocessate con la Pipeline del modello prototipo."""
+    provider = get_split_provider(data)
+    train_idx, test_idx = provider.get_split(test_size)
+    transformers = provider.get_transformers(("split", test_size), preprocessing_steps(prototype.model))
+    x_train = apply_transformers(transformers, provider.x[train_idx])
+    x_test = apply_transformers(transformers, provider.x[test_idx])
+    return x_train, x_test, provider.labels[train_idx], provider.labels[test_idx], provider.seed
+
+
+def _sweep_scores(results: dict, y_true, y_pred):
+    results["Accuracy"].append(accuracy_score(y_true, y_pred))
+    results["Precision"].append(precision_score(y_true, y_pred, zero_division=0))
+    results["Recall"].append(recall_score(y_true, y_pred, zero_division=0))
+    results["F1_precision"].append(f1_score(y_true, y_pred, zero_division=0))
+
+
+def _new_sweep(params) -> dict:
+    return {"params": list(params), "Accuracy": [], "Precision": [], "Recall": [], "F1_precision": []}
+
+
+def sweep_lr_max_iter(data: waterData, test_size: float, iterations) -> dict:
+    """
+    Curva delle metriche al variare di max_iter per la Logistic Regression.
+    Con warm_start ogni punto riprende dai coefficienti del precedente ed esegue
+    solo le iterazioni mancanti. L'ottimizzatore non conserva la memoria L-BFGS
+    tra un fit e l'altro: la curva approssima (non replica) i fit indipendenti.
+    """
+    start = time.perf_counter()
+    prototype = waterLogReg(data, test_size, use_registry=False)
+    x_train, x_test, y_train, y_test, _ = _sweep_matrices(data, test_size, prototype)
+
+    clf = clone(prototype.model.steps[-1][1]).set_params(warm_start=True)
+    results = _new_sweep(sorted(int(i) for i in iterations))
+    done = 0
+    for target in results["params"]:
+        if target > done:
+            clf.set_params(max_iter=target - done)
+            clf.fit(x_train, y_train)
+            done = target
+        _sweep_scores(results, y_test, clf.predict(x_test))
+    results["seconds"] = time.perf_counter() - start
+    return results
+
+
+def sweep_dt_depth(data: waterData, test_size: float, depths) -> dict:
+    """
+    Curva delle metriche al variare di max_depth per il Decision Tree.
+    Si addestra un solo albero alla profondità massima; la previsione a profondità d
+    è quella del nodo alla profondità d lungo il percorso del campione, cioè la
+    foglia dell'albero troncato (a meno di pareggi tra split equivalenti).
+    """
+    start = time.perf_counter()
+    prototype = waterDecTree(data, test_size, use_registry=False)
+    x_train, x_test, y_train, y_test, seed = _sweep_matrices(data, test_size, prototype)
+
+    results = _new_sweep(sorted(int(d) for d in depths))
+    clf = clone(prototype.model.steps[-1][1]).set_params(max_depth=max(results["params"]), random_state=seed)
+    clf.fit(x_train, y_train)
+
+    # Percorso di ogni campione: gli id dei nodi crescono con la profondità,
+    # quindi la posizione d nella riga della matrice sparsa è il nodo a profondità d
+    path = clf.decision_path(x_test)
+    path.sort_indices()
+    lengths = np.diff(path.indptr)
+    node_classes = clf.classes_[clf.tree_.value[:, 0].argmax(axis=1)]
+    for depth in results["params"]:
+        nodes = path.indices[path.indptr[:-1] + np.minimum(depth, lengths - 1)]
+        _sweep_scores(results, y_test, node_classes[nodes])
+    results["seconds"] = time.perf_counter() - start
+    return results
+
+
+def sweep_knn_neighbors(data: waterData, test_size: float, neighbors) -> dict:
+    """
+    Curva delle metriche al variare di k per il KNN.
+    Una sola query kneighbors con il k massimo: i voti per ogni k più piccolo
+    sono somme cumulative sulle etichette dei vicini già ordinati per distanza.
+    """
+    start = time.perf_counter()
+    prototype = waterKnn(data, test_size, use_registry=False)
+    x_train, x_test, y_train, y_test, _ = _sweep_matrices(data, test_size, prototype)
+
+    results = _new_sweep(sorted(int(k) for k in neighbors))
+    k_max = results["params"][-1]
+    knn = clone(prototype.model.steps[-1][1]).set_params(n_neighbors=k_max).fit(x_train, y_train)
+    neighbor_idx = knn.kneighbors(x_test, return_distance=False)
+    positive_votes = np.cumsum(y_train[neighbor_idx] == 1, axis=1)
+
+    for k in results["params"]:
+        # Maggioranza stretta per la classe 1; in caso di pareggio vince la classe 0 (come sklearn)
+        y_pred = (2 * positive_votes[:, k - 1] > k).astype(y_train.dtype)
+        _sweep_scores(results, y_test, y_pred)
+    results["seconds"] = time.perf_counter() - start
+    return results
+
+
 def metrics_graph_lr(data: waterData, test_size: float):
 
     # Riduco un po' i punti per rendere il calcolo più veloce (da 100 a 20)
     iterations_vect = linspace(10, 200, 20) 
-    precision_vect = []
-    recall_vect = []
-    f1_score_vect = []
-    accuracy_vect = []
+    results = sweep_lr_max_iter(data, test_size, iterations_vect)
+    iterations_vect = results["params"]
+    accuracy_vect = results["Accuracy"]
+    precision_vect = results["Precision"]
+    recall_vect = results["Recall"]
+    f1_score_vect = results["F1_precision"]
 
     a, graph_lr = plt.subplots(4, 1, figsize=(8, 12)) # Aumentata dimensione per leggibilità
     a.tight_layout(pad=5.0)
 
-    i = 0
-    while i < len(iterations_vect):
-        # CAMBIO NOME CLASSE
-        model_i = waterLogReg(
-            data, int(iterations_vect[i]), test_size)
-
-        model_i.predict()
-
-        accuracy_vect.append(model_i.get_metric("Accuracy"))
-        precision_vect.append(model_i.get_metric("Precision"))
-        recall_vect.append(model_i.get_metric("Recall"))
-        f1_score_vect.append(model_i.get_metric("F1_precision"))
-
-        i = i + 1
-
     graph_lr[0].plot(iterations_vect, accuracy_vect, color='blue')
     graph_lr[0].set_title("Accuracy - Logistic Regression")
 
@@ -57,27 +148,15 @@ def metrics_graph_dt(data: waterData, test_size: float):
 
     # Depth dell'albero da 1 a 20
     iterations_vect = get_linspace(1, 20, 1) 
-    precision_vect = []
-    recall_vect = []
-    f1_score_vect = []
-    accuracy_vect = []
+    results = sweep_dt_depth(data, test_size, iterations_vect)
+    accuracy_vect = results["Accuracy"]
+    precision_vect = results["Precision"]
+    recall_vect = results["Recall"]
+    f1_score_vect = results["F1_precision"]
 
     a, graph_lr = plt.subplots(2, 2, figsize=(10, 8))
     a.tight_layout(pad=4.0)
 
-    i = 0
-    while i < len(iterations_vect):
-        # CAMBIO NOME CLASSE
-        model_i = waterDecTree(data, iterations_vect[i], test_size)
-
-        model_i.predict()
-        accuracy_vect.append(model_i.get_metric("Accuracy"))
-        precision_vect.append(model_i.get_metric("Precision"))
-        recall_vect.append(model_i.get_metric("Recall"))
-        f1_score_vect.append(model_i.get_metric("F1_precision"))
-
-        i = i + 1
-
     graph_lr[0, 0].plot(iterations_vect, accuracy_vect, color='blue')
     graph_lr[0, 0].set_title("Accuracy - Decision Tree")
 
@@ -96,27 +175,15 @@ def metrics_graph_knn(data: waterData, test_size: float):
 
     # Neighbors da 1 a 50
     iterations_vect = get_linspace(1, 50, 2)
-    precision_vect = []
-    recall_vect = []
-    f1_score_vect = []
-    accuracy_vect = []
+    results = sweep_knn_neighbors(data, test_size, iterations_vect)
+    accuracy_vect = results["Accuracy"]
+    precision_vect = results["Precision"]
+    recall_vect = results["Recall"]
+    f1_score_vect = results["F1_precision"]
 
     a, graph_lr = plt.subplots(2, 2, figsize=(10, 8))
     a.tight_layout(pad=4.0)
 
-    i = 0
-    while i < len(iterations_vect):
-        # CAMBIO NOME CLASSE
-        model_i = waterKnn(data, test_size, iterations_vect[i])
-
-        model_i.predict()
-        accuracy_vect.append(model_i.get_metric("Accuracy"))
-        precision_vect.append(model_i.get_metric("Precision"))
-        recall_vect.append(model_i.get_metric("Recall"))
-        f1_score_vect.append(model_i.get_metric("F1_precision"))
-
-        i = i + 1
-
     graph_lr[0, 0].plot(iterations_vect, accuracy_vect, color='blue')
     graph_lr[0, 0].set_title("Accuracy - KNN")
 
@@ -140,7 +207,8 @@ def comparison_metrics_models(data: waterData, test_size: float):
         "Decision Tree": waterDecTree(data, test_size),
         "KNN": waterKnn(data, test_size, neighbors=9),
         "Neural Network": waterNeuralNetwork(data, test_size), # Bonus Cap. 8
-        "Naive Bayes": waterNaiveBayes(data, test_size)        # Bonus Cap. 9
+        "Naive Bayes": waterNaiveBayes(data, test_size),       # Bonus Cap. 9
+        "Gradient Boosting": waterHistGradientBoosting(data, test_size)  # NaN gestiti nativamente
     }
 
     # Strutture dati per il plot
@@ -157,10 +225,11 @@ def comparison_metrics_models(data: waterData, test_size: float):
     print("-" * 85)
     # -----------------------------
 
-    # 2. Calcolo Metriche e Stampa
+    # 2. Calcolo Metriche (tutti i modelli x 10 fold in parallelo) e Stampa
+    report = run_parallel_cv(models, folds=10)
+
     for name, model in models.items():
-        # Calcoliamo le metriche
-        means, stds = model.evaluate_with_cross_validation(folds=10)
+        means, stds = model.cv_means, model.cv_stds
         
         # Salviamo per il grafico
         model_names.append(name)
@@ -173,7 +242,9 @@ def comparison_metrics_models(data: waterData, test_size: float):
         print(f"{name:<25} | {means['Accuracy']:.3f} ± {stds['Accuracy']:.3f}        | "
               f"{means['Precision']:.3f}      | {means['Recall']:.3f}      | {means['F1']:.3f}")
     
-    print("="*85 + "\n")
+    print("="*85)
+    print_speedup(report)
+    print()
 
     # 3. Creazione Grafico Raggruppato
     x = np.arange(len(model_names))  # Posizioni sull'asse X
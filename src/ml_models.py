@@ -3,24 +3,103 @@ from sklearn.neighbors import KNeighborsClassifier
 from sklearn.neural_network import MLPClassifier
 from sklearn.naive_bayes import GaussianNB
 from sklearn.tree import DecisionTreeClassifier
+from sklearn.ensemble import HistGradientBoostingClassifier
 from sklearn.metrics import (ConfusionMatrixDisplay, accuracy_score,
                              confusion_matrix, f1_score, precision_score,
-                             recall_score, roc_curve, auc)
+                             recall_score, roc_curve, auc, precision_recall_curve,
+                             average_precision_score)
 from sklearn.model_selection import train_test_split, cross_validate
 from sklearn.preprocessing import StandardScaler
+from sklearn.base import clone
 from sklearn import tree
 from sklearn.impute import SimpleImputer  
 from sklearn.pipeline import Pipeline     
 import matplotlib.pyplot as plt
 import numpy as np
+import time
 from typing import Optional
 
 # Import relativo per il package src
 from .data_loader import waterData 
+from .split_provider import splitProvider, get_split_provider, preprocessing_steps, apply_transformers
+from .model_registry import registry, pipeline_params
+from .numpy_inference import export_pipeline
+from .cv_cache import cv_cache
+
+CV_METRICS = ['Accuracy', 'Precision', 'Recall', 'F1']
+
+
+def predict_labels_proba(model, x):
+    """
+    Etichette e probabilità di Potability=1 in una sola chiamata vettoriale:
+    l'etichetta è la classe con probabilità massima (come fa predict()).
+    """
+    proba = model.predict_proba(x)
+    labels = model.classes_[proba.argmax(axis=1)]
+    return labels, proba[:, 1]
+
+
+def fit_and_score_fold(model, transformers: list, x, y, train_idx, test_idx) -> dict:
+    """
+    Addestra una copia dello stimatore finale su un fold, usando i trasformatori
+    di preprocessing già stimati (condivisi tra i modelli), e ne calcola le metriche.
+    """
+    estimator = model.steps[-1][1] if isinstance(model, Pipeline) else model
+    clf = clone(estimator)
+    y = y.ravel()
+
+    start = time.perf_counter()
+    clf.fit(apply_transformers(transformers, x[train_idx]), y[train_idx])
+    fit_time = time.perf_counter() - start
+
+    y_true = y[test_idx]
+    y_pred = clf.predict(apply_transformers(transformers, x[test_idx]))
+    return {
+        'Accuracy': accuracy_score(y_true, y_pred),
+        'Precision': precision_score(y_true, y_pred, zero_division=0),
+        'Recall': recall_score(y_true, y_pred, zero_division=0),
+        'F1': f1_score(y_true, y_pred, zero_division=0),
+        'fit_time': fit_time
+    }
+
+
+class _indexedSplit:
+    """
+    Attributo di split (x_train, y_test, ...). Se il modello conserva solo gli
+    indici (modalità compatta), la matrice viene estratta da x/y solo quando
+    viene letta e non resta in memoria dopo il fit. Ogni lettura è una nuova
+    copia: nei percorsi caldi va letta una volta sola in una variabile locale.
+    """
+
+    def __init__(self, source: str, index: str):
+        self.source = source
+        self.index = index
+
+    def __set_name__(self, owner, name):
+        self.name = "_" + name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        value = obj.__dict__.get(self.name)
+        indices = obj.__dict__.get(self.index)
+        if value is None and indices is not None:
+            return getattr(obj, self.source)[indices]
+        return value
+
+    def __set__(self, obj, value):
+        obj.__dict__[self.name] = value
+
 
 class waterModel:
 
-    def __init__(self, model, x, y, scores_dict: dict, test_size: float):
+    x_train = _indexedSplit("x", "train_idx")
+    x_test = _indexedSplit("x", "test_idx")
+    y_train = _indexedSplit("y", "train_idx")
+    y_test = _indexedSplit("y", "test_idx")
+
+    def __init__(self, model, x, y, scores_dict: dict, test_size: float,
+                 hyperparams: Optional[dict] = None, use_registry: bool = True):
         # Default safety check
         if not (0 < test_size < 1):
             test_size = 0.2
@@ -35,12 +114,49 @@ class waterModel:
         # Variabili per i risultati CV
         self.cv_means = {}
         self.cv_stds = {}
+        self.cv_results = []
+        self.cv_from_cache = False
+        self.use_cv_cache = True
 
+        self.provider = None
+        self.split_key = None
+        self.train_idx = None
+        self.test_idx = None
         self.x_train = None
         self.x_test = None
         self.y_train = None
         self.y_test = None
         self.y_predicted = None
+        # Record di valutazione del test set (etichette, probabilità, ROC, PR, matrice)
+        self.evaluation = None
+
+        # Registro dei modelli addestrati (riuso delle Pipeline tra un avvio e l'altro)
+        self.hyperparams = hyperparams or {}
+        self.use_registry = use_registry
+        self.registry_key = None
+        self.from_registry = False
+
+    def _split(self, provider: splitProvider):
+        """
+        Usa lo split stratificato condiviso dal provider: tutti i modelli vengono
+        valutati sulle stesse righe e conservano solo gli indici, non copie dei dati.
+        Se il registro contiene già la Pipeline addestrata su questo split, la carica.
+        """
+        self.provider = provider
+        self.split_key = ("split", self.test_size)
+        self.train_idx, self.test_idx = provider.get_split(self.test_size)
+
+        if self.use_registry:
+            split = {"test_size": self.test_size, "seed": provider.seed, "dtype": str(self.x.dtype)}
+            self.registry_key = registry.make_key(provider.fingerprint, self.__class__.__name__, self.hyperparams,
+                                                  split, pipeline_params(self.model))
+            loaded = registry.load(self.__class__.__name__, self.registry_key)
+            if loaded is not None:
+                self.model, _ = loaded
+                self.from_registry = True
+
+    def _has_split(self):
+        return self.train_idx is not None or self.__dict__.get('_x_train') is not None
 
     def get_x(self):
         return self.x
@@ -64,15 +180,49 @@ class waterModel:
               f"Recall: {self.scores.get('Recall', 0):.4f} | "
               f"F1: {self.scores.get('F1_precision', 0):.4f}")
 
-    def get_roc_curve(self):
-        # Supporto Pipeline: estrae l'ultimo step
+    def export_numpy(self):
+        """Predittore NumPy-only equivalente alla Pipeline addestrata (vedi numpy_inference)."""
+        if self.y_predicted is None and not self.from_registry:
+            raise ValueError("Modello non addestrato: eseguire prima predict().")
+        return export_pipeline(self.model)
+
+    def evaluate_test_set(self) -> dict:
+        """
+        Un solo passaggio di inferenza sul test set: etichette e probabilità
+        da predict_proba, da cui derivano ROC, AUC, curva PR e matrice di confusione.
+        Il record resta in self.evaluation ed è letto da metriche, grafici e app.
+        """
+        x_test, y_true = self.x_test, self.y_test.ravel()
         estimator = self.model.steps[-1][1] if isinstance(self.model, Pipeline) else self.model
+        if hasattr(estimator, "predict_proba"):
+            labels, proba = predict_labels_proba(self.model, x_test)
+        else:
+            labels, proba = self.model.predict(x_test), None
+        del x_test
+
+        record = {"split": self.split_key, "y_true": y_true, "labels": labels, "proba": proba,
+                  "confusion_matrix": confusion_matrix(y_true, labels, labels=[0, 1])}
+        if proba is not None:
+            fpr, tpr, roc_thresholds = roc_curve(y_true, proba)
+            precision, recall, pr_thresholds = precision_recall_curve(y_true, proba)
+            record.update({
+                "fpr": fpr, "tpr": tpr, "roc_thresholds": roc_thresholds, "auc": auc(fpr, tpr),
+                "precision": precision, "recall": recall, "pr_thresholds": pr_thresholds,
+                "average_precision": average_precision_score(y_true, proba),
+            })
+
+        self.evaluation = record
+        self.y_predicted = labels
+        return record
+
+    def get_evaluation(self) -> dict:
+        """Record di valutazione del test set (vedi evaluate_test_set), None se non addestrato."""
+        return self.evaluation
 
-        if hasattr(estimator, "predict_proba") and self.x_test is not None and self.y_test is not None:
+    def get_roc_curve(self):
+        if self.evaluation is not None and self.evaluation.get("proba") is not None:
             try:
-                y_probs = self.model.predict_proba(self.x_test)[:, 1]
-                fpr, tpr, _ = roc_curve(self.y_test, y_probs)
-                roc_auc = auc(fpr, tpr)
+                fpr, tpr, roc_auc = self.evaluation["fpr"], self.evaluation["tpr"], self.evaluation["auc"]
                 
                 plt.figure(figsize=(8, 6))
                 plt.plot(fpr, tpr, color='darkorange', lw=2, label=f'ROC curve (area = {roc_auc:.2f})')
@@ -91,8 +241,8 @@ class waterModel:
             print(f"       [Info] Il modello {self.__class__.__name__} non supporta la curva ROC.")
 
     def get_confusion_matrix(self):
-        if self.y_test is not None and self.y_predicted is not None:
-            cm = confusion_matrix(self.y_test, self.y_predicted)
+        if self.evaluation is not None:
+            cm = self.evaluation["confusion_matrix"]
             
             # Se usato da script (main_ml.py), mostra il grafico
             # Nota: Per Streamlit è meglio non usare plt.show() qui, ma restituire cm
@@ -109,30 +259,57 @@ class waterModel:
             print("Dati non pronti (cm is None)") # Questo spiega il messaggio che vedi
             return None
 
+    def cv_cache_key(self, folds: int) -> Optional[str]:
+        """
+        Chiave dei risultati CV nella cache: dataset, classe, parametri di tutti gli
+        step della Pipeline, seed e numero dei fold, metriche. None se non applicabile.
+        """
+        if self.provider is None or not self.use_cv_cache:
+            return None
+        steps = self.model.steps if isinstance(self.model, Pipeline) else [('clf', self.model)]
+        params = {
+            "hyperparams": self.hyperparams,
+            "steps": [(name, type(step).__name__, step.get_params(deep=False)) for name, step in steps],
+            "dtype": str(self.x.dtype),
+        }
+        return cv_cache.make_key(self.provider.fingerprint, self.__class__.__name__, params,
+                                 self.provider.seed, folds, CV_METRICS)
+
+    def set_cv_results(self, results: list):
+        """Registra i risultati per fold e ne calcola medie e deviazioni standard."""
+        self.cv_results = results
+        scores = {m: np.array([r[m] for r in results]) for m in CV_METRICS}
+        self.cv_means = {m: scores[m].mean() for m in CV_METRICS}
+        self.cv_stds = {m: scores[m].std() for m in CV_METRICS}
+
     def evaluate_with_cross_validation(self, folds=10):
         """
         Esegue la Cross-Validation calcolando TUTTE le metriche.
         Restituisce tuple (media_accuracy, std_accuracy).
+        Con il provider, i risultati per fold vengono letti/salvati nella cache CV.
         """
-        scoring = ['accuracy', 'precision', 'recall', 'f1']
-        
-        # Eseguiamo la CV
-        scores = cross_validate(self.model, self.x, self.y.ravel(), cv=folds, scoring=scoring)
-        
-        self.cv_means = {
-            'Accuracy': scores['test_accuracy'].mean(),
-            'Precision': scores['test_precision'].mean(),
-            'Recall': scores['test_recall'].mean(),
-            'F1': scores['test_f1'].mean()
-        }
-        
-        self.cv_stds = {
-            'Accuracy': scores['test_accuracy'].std(),
-            'Precision': scores['test_precision'].std(),
-            'Recall': scores['test_recall'].std(),
-            'F1': scores['test_f1'].std()
-        }
-        
+        if self.provider is None:
+            # Modello costruito senza provider: CV classica di scikit-learn
+            scoring = ['accuracy', 'precision', 'recall', 'f1']
+            raw = cross_validate(self.model, self.x, self.y.ravel(), cv=folds, scoring=scoring)
+            results = [dict({m: raw[f'test_{m.lower()}'][i] for m in CV_METRICS}, fit_time=raw['fit_time'][i])
+                       for i in range(folds)]
+            self.cv_from_cache = False
+        else:
+            key = self.cv_cache_key(folds)
+            results = cv_cache.load(self.__class__.__name__, key) if key is not None else None
+            self.cv_from_cache = results is not None
+            if results is None:
+                # Fold e statistiche di Imputer/Scaler arrivano dalla cache condivisa
+                steps = preprocessing_steps(self.model)
+                results = []
+                for i, (train_idx, test_idx) in enumerate(self.provider.get_folds(folds)):
+                    transformers = self.provider.get_transformers(("fold", folds, i), steps)
+                    results.append(fit_and_score_fold(self.model, transformers, self.x, self.y, train_idx, test_idx))
+                if key is not None:
+                    cv_cache.save(self.__class__.__name__, key, results)
+
+        self.set_cv_results(results)
         return self.cv_means['Accuracy'], self.cv_stds['Accuracy']
 
     def _single_split_fit(self):
@@ -140,29 +317,53 @@ class waterModel:
         Esegue fit/predict su un singolo split.
         La PIPELINE gestisce Imputer e Scaler internamente, quindi non servono qui.
         """
-        if self.x_train is None or self.x_test is None or self.y_train is None:
+        if not self._has_split():
             raise ValueError("Split non effettuato.")
-            
-        # ORA È MOLTO PIÙ PULITO:
-        self.model.fit(self.x_train, self.y_train.ravel())
-        self.y_predicted = self.model.predict(self.x_test)
-        
-        self._calculate_scores()
-
-    def _calculate_scores(self):
-        if self.y_test is not None and self.y_predicted is not None:
-            self.scores["Accuracy"] = accuracy_score(self.y_test, self.y_predicted)
-            self.scores["Precision"] = precision_score(self.y_test, self.y_predicted, zero_division=0)
-            self.scores["Recall"] = recall_score(self.y_test, self.y_predicted, zero_division=0)
-            self.scores["F1_precision"] = f1_score(self.y_test, self.y_predicted, zero_division=0)
+
+        steps = preprocessing_steps(self.model)
+        if self.from_registry:
+            # Pipeline già addestrata caricata dal registro: niente fit
+            pass
+        elif self.provider is not None and steps:
+            # Imputer/Scaler già stimati sullo split condiviso: si addestra solo il classificatore
+            transformers = self.provider.fitted_copy(self.split_key, steps)
+            name, clf = self.model.steps[-1]
+            x_train, y_train = self.x_train, self.y_train.ravel()
+            clf.fit(apply_transformers(transformers, x_train), y_train)
+            del x_train, y_train
+            self.model = Pipeline([(step_name, t) for (step_name, _), t in zip(steps, transformers)] + [(name, clf)])
+        else:
+            x_train, y_train = self.x_train, self.y_train.ravel()
+            self.model.fit(x_train, y_train)
+            del x_train, y_train
+
+        if self.registry_key is not None and not self.from_registry:
+            registry.save(self.__class__.__name__, self.registry_key, self.model, {
+                "fingerprint": self.provider.fingerprint,
+                "hyperparams": self.hyperparams,
+                "test_size": self.test_size,
+                "seed": self.provider.seed,
+            })
+        self._calculate_scores(self.evaluate_test_set()["y_true"])
+
+    def _calculate_scores(self, y_test=None):
+        # y_test: etichette del test set già lette dal chiamante (evita un'altra copia)
+        if y_test is None:
+            y_test = self.y_test
+        if y_test is not None and self.y_predicted is not None:
+            self.scores["Accuracy"] = accuracy_score(y_test, self.y_predicted)
+            self.scores["Precision"] = precision_score(y_test, self.y_predicted, zero_division=0)
+            self.scores["Recall"] = recall_score(y_test, self.y_predicted, zero_division=0)
+            self.scores["F1_precision"] = f1_score(y_test, self.y_predicted, zero_division=0)
         else:
             self.scores.update({"Accuracy": 0.0, "Precision": 0.0, "Recall": 0.0, "F1_precision": 0.0})
 
 # --- SOTTOCLASSI CORRETTE E PARAMETRIZZATE ---
 
 class waterLogReg(waterModel):
-    def __init__(self, data: waterData, test_size: float, max_iter=1000):
-        x, y = data.get_training_data()
+    def __init__(self, data: waterData, test_size: float, max_iter=1000, use_registry: bool = True):
+        provider = get_split_provider(data)
+        x, y = provider.get_training_data()
         # DEFINIZIONE PIPELINE
         pipeline = Pipeline([
             ('imputer', SimpleImputer(strategy='mean')), # Gestisce i NaN
@@ -170,32 +371,34 @@ class waterLogReg(waterModel):
             ('clf', LogisticRegression(max_iter=max_iter, class_weight='balanced'))
         ])
         
-        super().__init__(pipeline, x, y, {}, test_size)
-        self.x_train, self.x_test, self.y_train, self.y_test = train_test_split(self.x, self.y, test_size=self.test_size)
+        super().__init__(pipeline, x, y, {}, test_size, {'max_iter': max_iter}, use_registry)
+        self._split(provider)
 
     def predict(self):
         self._single_split_fit()
 
 class waterDecTree(waterModel):
-    def __init__(self, data: waterData, test_size: float, max_depth=5):
-        x, y = data.get_training_data()
+    def __init__(self, data: waterData, test_size: float, max_depth=5, use_registry: bool = True):
+        provider = get_split_provider(data)
+        x, y = provider.get_training_data()
 
         # Anche i Tree beneficiano dell'Imputer (sklearn non supporta NaN nei tree standard)
         pipeline = Pipeline([
             ('imputer', SimpleImputer(strategy='mean')),
             # Scaler non strettamente necessario per Tree, ma male non fa
-            ('clf', DecisionTreeClassifier(max_depth=max_depth)) 
+            ('clf', DecisionTreeClassifier(max_depth=max_depth, random_state=provider.seed))
         ])
         
-        super().__init__(pipeline, x, y, {}, test_size)
-        self.x_train, self.x_test, self.y_train, self.y_test = train_test_split(self.x, self.y, test_size=self.test_size)
+        super().__init__(pipeline, x, y, {}, test_size, {'max_depth': max_depth}, use_registry)
+        self._split(provider)
 
     def predict(self):
         self._single_split_fit()
 
 class waterKnn(waterModel):
-    def __init__(self, data: waterData, test_size: float, neighbors=5):
-        x, y = data.get_training_data()
+    def __init__(self, data: waterData, test_size: float, neighbors=5, use_registry: bool = True):
+        provider = get_split_provider(data)
+        x, y = provider.get_training_data()
 
         pipeline = Pipeline([
             ('imputer', SimpleImputer(strategy='mean')),
@@ -203,32 +406,35 @@ class waterKnn(waterModel):
             ('clf', KNeighborsClassifier(n_neighbors=neighbors))
         ])
         
-        super().__init__(pipeline, x, y, {}, test_size)
-        self.x_train, self.x_test, self.y_train, self.y_test = train_test_split(self.x, self.y, test_size=self.test_size)
+        super().__init__(pipeline, x, y, {}, test_size, {'neighbors': neighbors}, use_registry)
+        self._split(provider)
     
     def predict(self):
         self._single_split_fit()
 
 class waterNeuralNetwork(waterModel):
-    def __init__(self, data: waterData, test_size: float, hidden_layers=(64, 32), max_iter=1000):
-        x, y = data.get_training_data()
+    def __init__(self, data: waterData, test_size: float, hidden_layers=(64, 32), max_iter=1000, use_registry: bool = True):
+        provider = get_split_provider(data)
+        x, y = provider.get_training_data()
 
         # Parametri architetturali ora sono dinamici
         pipeline = Pipeline([
             ('imputer', SimpleImputer(strategy='mean')),
             ('scaler', StandardScaler()), # Fondamentale per MLP
-            ('clf', MLPClassifier(hidden_layer_sizes=hidden_layers, max_iter=max_iter))
+            ('clf', MLPClassifier(hidden_layer_sizes=hidden_layers, max_iter=max_iter, random_state=provider.seed))
         ])
         
-        super().__init__(pipeline, x, y, {}, test_size)
-        self.x_train, self.x_test, self.y_train, self.y_test = train_test_split(self.x, self.y, test_size=self.test_size)
+        super().__init__(pipeline, x, y, {}, test_size,
+                         {'hidden_layers': list(hidden_layers), 'max_iter': max_iter}, use_registry)
+        self._split(provider)
 
     def predict(self):
         self._single_split_fit()
 
 class waterNaiveBayes(waterModel):
-    def __init__(self, data: waterData, test_size: float):
-        x, y = data.get_training_data()
+    def __init__(self, data: waterData, test_size: float, use_registry: bool = True):
+        provider = get_split_provider(data)
+        x, y = provider.get_training_data()
         
         pipeline = Pipeline([
             ('imputer', SimpleImputer(strategy='mean')),
@@ -236,8 +442,30 @@ class waterNaiveBayes(waterModel):
             ('clf', GaussianNB())
         ])
         
-        super().__init__(pipeline, x, y, {}, test_size)
-        self.x_train, self.x_test, self.y_train, self.y_test = train_test_split(self.x, self.y, test_size=self.test_size)
+        super().__init__(pipeline, x, y, {}, test_size, {}, use_registry)
+        self._split(provider)
+
+    def predict(self):
+        self._single_split_fit() # Ora usa la pipeline standard
+
+class waterHistGradientBoosting(waterModel):
+    def __init__(self, data: waterData, test_size: float, max_iter=200, learning_rate=0.1,
+                 max_leaf_nodes=31, use_registry: bool = True):
+        provider = get_split_provider(data)
+        x, y = provider.get_training_data()
+
+        # Nessun Imputer: i NaN finiscono in un bin dedicato e ogni split
+        # impara da che parte mandarli. Le feature vengono discretizzate (max 255 bin)
+        # una volta per fit, poi gli alberi lavorano sugli istogrammi.
+        pipeline = Pipeline([
+            ('clf', HistGradientBoostingClassifier(max_iter=max_iter, learning_rate=learning_rate,
+                                                   max_leaf_nodes=max_leaf_nodes, random_state=provider.seed))
+        ])
+
+        super().__init__(pipeline, x, y, {}, test_size,
+                         {'max_iter': max_iter, 'learning_rate': learning_rate, 'max_leaf_nodes': max_leaf_nodes},
+                         use_registry)
+        self._split(provider)
 
     def predict(self):
-        self._single_split_fit() # Ora usa la pipeline standard
\ No newline at end of file
+        self._single_split_fit()
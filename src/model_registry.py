@@ -0,0 +1,93 @@
+import sklearn
+import joblib
+import numpy as np
+import hashlib
+import json
+import time
+import os
+
+from .data_loader import BASE_DIR
+
+REGISTRY_DIR = os.path.join(BASE_DIR, "models")
+
+# Versione del formato della chiave: va incrementata se cambia cosa identifica un artefatto
+REGISTRY_FORMAT = 2
+
+
+def library_versions() -> dict:
+    """Versioni delle librerie che determinano il formato dei modelli serializzati."""
+    return {"sklearn": sklearn.__version__, "numpy": np.__version__, "joblib": joblib.__version__}
+
+
+def pipeline_params(pipeline) -> dict:
+    """
+    Struttura e parametri della Pipeline non addestrata (get_params(deep=True)):
+    gli step compaiono come (nome, classe), i loro parametri come 'step__parametro'.
+    """
+    params = {name: value for name, value in pipeline.get_params(deep=True).items()
+              if not hasattr(value, "get_params") and name != "steps"}
+    if hasattr(pipeline, "steps"):
+        params["steps"] = [(name, type(step).__name__) for name, step in pipeline.steps]
+    else:
+        params["steps"] = [("clf", type(pipeline).__name__)]
+    return params
+
+
+class modelRegistry:
+    """
+    Archivio su disco delle Pipeline già addestrate.
+    Ogni artefatto è identificato da dataset (hash), classe del modello, iperparametri,
+    struttura e parametri della Pipeline e split; viene riusato solo se le versioni
+    delle librerie coincidono.
+    """
+
+    def __init__(self, folder: str = REGISTRY_DIR):
+        self.folder = folder
+
+    @staticmethod
+    def make_key(fingerprint: str, model_class: str, hyperparams: dict, split: dict,
+                 params: dict = None) -> str:
+        description = json.dumps({
+            "format": REGISTRY_FORMAT,
+            "fingerprint": fingerprint,
+            "model_class": model_class,
+            "hyperparams": hyperparams,
+            "split": split,
+            "params": params,
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(description.encode("utf-8")).hexdigest()
+
+    def _path(self, model_class: str, key: str) -> str:
+        return os.path.join(self.folder, f"{model_class}-{key[:16]}.joblib")
+
+    def load(self, model_class: str, key: str):
+        """Restituisce (pipeline, meta) se esiste un artefatto compatibile, altrimenti None."""
+        path = self._path(model_class, key)
+        if not os.path.exists(path):
+            return None
+        try:
+            artifact = joblib.load(path)
+        except Exception as e:
+            print(f"[WARN] Artefatto non leggibile ({path}): {e}")
+            return None
+        meta = artifact.get("meta", {})
+        if meta.get("key") != key or meta.get("versions") != library_versions():
+            return None
+        return artifact["pipeline"], meta
+
+    def save(self, model_class: str, key: str, pipeline, meta: dict):
+        """Salva la Pipeline addestrata (scrittura atomica: file temporaneo + rename)."""
+        meta = dict(meta, key=key, model_class=model_class,
+                    versions=library_versions(), created=time.strftime("%Y-%m-%d %H:%M:%S"))
+        path = self._path(model_class, key)
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            joblib.dump({"pipeline": pipeline, "meta": meta}, tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[WARN] Modello non salvato nel registro: {e}")
+
+
+# Istanza globale
+registry = modelRegistry()
@@ -0,0 +1,303 @@
+import numpy as np
+
+# Nessun import di scikit-learn: questo modulo deve poter girare anche senza.
+# L'esportazione legge solo gli attributi dei modelli addestrati (coef_, tree_, ...).
+try:
+    # Stessa sigmoide di scikit-learn (libm): np.exp differisce nell'ultima cifra binaria
+    from scipy.special import expit as _scipy_expit
+except ImportError:
+    _scipy_expit = None
+
+PREDICTOR_KINDS = ["linear", "naive_bayes", "mlp", "tree", "knn", "boosting"]
+
+# Righe di input elaborate per volta dal KNN (matrice delle distanze righe x train)
+KNN_CHUNK_SIZE = 256
+# Righe elaborate per volta dal boosting (matrice dei nodi correnti righe x alberi)
+BOOSTING_CHUNK_SIZE = 4096
+
+
+def _expit(z):
+    """Sigmoide calcolata in place (scipy.special.expit se disponibile)."""
+    if _scipy_expit is not None:
+        return _scipy_expit(z, out=z)
+    np.negative(z, out=z)
+    np.exp(z, out=z)
+    z += 1.0
+    np.reciprocal(z, out=z)
+    return z
+
+
+def _export_preprocessing(steps) -> dict:
+    """Imputer e Scaler della Pipeline ridotti a vettori (medie, centri, scale)."""
+    arrays = {}
+    for _, step in steps:
+        kind = type(step).__name__
+        if kind in ("SimpleImputer", "runningMeanImputer"):
+            if getattr(step, "strategy", "mean") != "mean":
+                raise ValueError(f"Imputer con strategia '{step.strategy}' non esportabile")
+            arrays["imputer_statistics"] = np.asarray(step.statistics_, dtype=np.float64)
+        elif kind == "StandardScaler":
+            if step.with_mean:
+                arrays["scaler_mean"] = np.asarray(step.mean_, dtype=np.float64)
+            if step.with_std:
+                arrays["scaler_scale"] = np.asarray(step.scale_, dtype=np.float64)
+        elif kind == "runningStandardScaler":
+            # Scaler dei modelli online: i NaN rimasti dopo l'imputer valgono 0 dopo la scalatura
+            arrays["scaler_mean"] = np.asarray(step.mean_, dtype=np.float64)
+            arrays["scaler_scale"] = np.asarray(step.scale_, dtype=np.float64)
+            arrays["scaler_nan_to_zero"] = np.array(True)
+        else:
+            raise ValueError(f"Step di preprocessing non esportabile: {kind}")
+    return arrays
+
+
+def _export_estimator(clf):
+    """(tipo, array) dello stimatore finale."""
+    kind = type(clf).__name__
+    if kind in ("LogisticRegression", "SGDClassifier"):
+        if kind == "SGDClassifier" and clf.loss != "log_loss":
+            raise ValueError("SGDClassifier esportabile solo con loss='log_loss'")
+        return "linear", {"coef": np.ascontiguousarray(clf.coef_.T), "intercept": clf.intercept_.copy()}
+
+    if kind == "GaussianNB":
+        return "naive_bayes", {
+            "log_prior": np.log(clf.class_prior_),
+            # -0.5 * sum(log(2*pi*var)) per classe, lo stesso termine costante di scikit-learn
+            "log_norm": np.array([-0.5 * np.sum(np.log(2.0 * np.pi * clf.var_[i, :]))
+                                  for i in range(len(clf.classes_))]),
+            "theta": clf.theta_.copy(),
+            "var": clf.var_.copy(),
+        }
+
+    if kind == "MLPClassifier":
+        if clf.activation != "relu" or clf.out_activation_ != "logistic":
+            raise ValueError("MLP esportabile solo con attivazione relu e uscita logistica (binaria)")
+        arrays = {"n_layers": np.array(len(clf.coefs_))}
+        for i, (w, b) in enumerate(zip(clf.coefs_, clf.intercepts_)):
+            arrays[f"coef_{i}"] = w.copy()
+            arrays[f"intercept_{i}"] = b.copy()
+        return "mlp", arrays
+
+    if kind == "DecisionTreeClassifier":
+        tree = clf.tree_
+        value = tree.value[:, 0, :].copy()
+        normalizer = value.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        value /= normalizer
+        return "tree", {
+            "children_left": tree.children_left.copy(),
+            "children_right": tree.children_right.copy(),
+            "feature": tree.feature.copy(),
+            "threshold": tree.threshold.copy(),
+            "proba": value,
+            "max_depth": np.array(tree.max_depth),
+        }
+
+    if kind == "KNeighborsClassifier":
+        if clf.weights != "uniform" or clf.effective_metric_ != "euclidean":
+            raise ValueError("KNN esportabile solo con pesi uniformi e distanza euclidea")
+        return "knn", {
+            "train_x": np.asarray(clf._fit_X, dtype=np.float64),
+            "train_y": np.asarray(clf._y, dtype=np.intp),
+            "n_neighbors": np.array(clf.n_neighbors),
+        }
+
+    if kind == "HistGradientBoostingClassifier":
+        if len(clf.classes_) != 2 or any(p.nodes["is_categorical"].any() for (p,) in clf._predictors):
+            raise ValueError("Boosting esportabile solo per classificazione binaria senza feature categoriche")
+        # Nodi di tutti gli alberi in array piatti, con indici dei figli globali
+        nodes = [p.nodes for (p,) in clf._predictors]
+        offsets = np.cumsum([0] + [len(n) for n in nodes[:-1]])
+        flat = np.concatenate(nodes)
+        shift = np.repeat(offsets, [len(n) for n in nodes])
+        return "boosting", {
+            "roots": offsets.astype(np.intp),
+            "left": np.where(flat["is_leaf"], -1, flat["left"].astype(np.intp) + shift),
+            "right": np.where(flat["is_leaf"], -1, flat["right"].astype(np.intp) + shift),
+            "feature": flat["feature_idx"].astype(np.intp),
+            "threshold": flat["num_threshold"].astype(np.float64),
+            "missing_go_to_left": flat["missing_go_to_left"].astype(bool),
+            "value": flat["value"].astype(np.float64),
+            "baseline": np.asarray(clf._baseline_prediction, dtype=np.float64).ravel(),
+            "max_depth": np.array(int(flat["depth"].max())),
+        }
+
+    raise ValueError(f"Stimatore non esportabile: {kind}")
+
+
+def export_pipeline(pipeline) -> "numpyPredictor":
+    """
+    Converte una Pipeline addestrata (Imputer -> Scaler -> stimatore) in un
+    predittore che usa solo NumPy. Accetta anche uno stimatore senza Pipeline.
+    """
+    steps = getattr(pipeline, "steps", None)
+    if steps is None:
+        steps = [("clf", pipeline)]
+    clf = steps[-1][1]
+    if not hasattr(clf, "classes_"):
+        raise ValueError("Il modello deve essere addestrato prima dell'esportazione.")
+
+    kind, arrays = _export_estimator(clf)
+    arrays.update(_export_preprocessing(steps[:-1]))
+    arrays["classes"] = np.asarray(clf.classes_)
+    return numpyPredictor(kind, arrays)
+
+
+class numpyPredictor:
+    """
+    Predittore NumPy-only ottenuto da una Pipeline addestrata.
+    I parametri sono array piatti, salvabili con np.savez; le operazioni
+    ricalcano quelle di scikit-learn nello stesso ordine, così i risultati
+    coincidono bit per bit (vedi verify_export) senza il costo di validazione
+    e dispatch di Pipeline.predict_proba.
+    """
+
+    def __init__(self, kind: str, arrays: dict):
+        if kind not in PREDICTOR_KINDS:
+            raise ValueError(f"Tipo di predittore non supportato: {kind} (ammessi: {PREDICTOR_KINDS})")
+        self.kind = kind
+        self.arrays = arrays
+        self.classes = arrays["classes"]
+
+    def _preprocess(self, x):
+        # Copia dell'input: float32 resta float32 (come Imputer/Scaler di scikit-learn)
+        x = np.array(x, dtype=np.float32 if np.asarray(x).dtype == np.float32 else np.float64, ndmin=2)
+        statistics = self.arrays.get("imputer_statistics")
+        if statistics is not None:
+            missing = np.isnan(x)
+            if missing.any():
+                x[missing] = np.take(statistics, np.nonzero(missing)[1])
+        if "scaler_mean" in self.arrays:
+            x -= self.arrays["scaler_mean"].astype(x.dtype)
+        if "scaler_scale" in self.arrays:
+            x /= self.arrays["scaler_scale"].astype(x.dtype)
+        if "scaler_nan_to_zero" in self.arrays:
+            x[np.isnan(x)] = 0.0
+        return x
+
+    def _positive_proba(self, x):
+        """Probabilità della classe positiva (seconda colonna di predict_proba)."""
+        a = self.arrays
+        if self.kind == "linear":
+            return _expit((x @ a["coef"] + a["intercept"]).reshape(-1))
+
+        if self.kind == "boosting":
+            return _expit(self._raw_boosting(x))
+
+        if self.kind == "mlp":
+            activation = x
+            last = int(a["n_layers"]) - 1
+            for i in range(last + 1):
+                activation = activation @ a[f"coef_{i}"]
+                activation += a[f"intercept_{i}"]
+                if i != last:
+                    np.maximum(activation, 0, out=activation)
+            return _expit(activation).ravel()
+
+        return self._class_proba(x)[:, 1]
+
+    def _raw_boosting(self, x):
+        """Somma del valore iniziale e delle foglie di tutti gli alberi, nello stesso ordine di scikit-learn."""
+        a = self.arrays
+        x = x.astype(np.float64)
+        left, right, feature = a["left"], a["right"], a["feature"]
+        threshold, missing_left = a["threshold"], a["missing_go_to_left"]
+        raw = np.empty(len(x))
+        for start in range(0, len(x), BOOSTING_CHUNK_SIZE):
+            block = x[start:start + BOOSTING_CHUNK_SIZE]
+            rows = np.arange(len(block))[:, np.newaxis]
+            node = np.broadcast_to(a["roots"], (len(block), len(a["roots"]))).copy()
+            for _ in range(int(a["max_depth"])):
+                internal = left[node] != -1
+                if not internal.any():
+                    break
+                values = block[rows, feature[node]]
+                go_left = np.where(np.isnan(values), missing_left[node], values <= threshold[node])
+                node = np.where(internal, np.where(go_left, left[node], right[node]), node)
+            # Somma sequenziale (cumsum) come gli += albero per albero di scikit-learn
+            leaves = np.concatenate([np.broadcast_to(a["baseline"], (len(block), 1)), a["value"][node]], axis=1)
+            raw[start:start + len(block)] = np.cumsum(leaves, axis=1)[:, -1]
+        return raw
+
+    def _class_proba(self, x):
+        """Matrice completa delle probabilità per i modelli non lineari."""
+        a = self.arrays
+        if self.kind == "naive_bayes":
+            jll = np.stack([a["log_prior"][i] + (a["log_norm"][i] - 0.5 * np.sum(
+                ((x - a["theta"][i, :]) ** 2) / a["var"][i, :], axis=1)) for i in range(len(self.classes))]).T
+            # log-sum-exp con la stessa sequenza di operazioni di scikit-learn
+            jll_max = jll.max(axis=1, keepdims=True)
+            is_max = jll == jll_max
+            others = np.where(is_max, -np.inf, jll)
+            m = is_max.sum(axis=1, keepdims=True, dtype=jll.dtype)
+            s = np.sum(np.exp(others - np.where(np.isfinite(jll_max), jll_max, 0.0)), axis=1, keepdims=True)
+            s = np.where(s == 0, s, s / m)
+            log_prob_x = (np.log1p(s) + np.log(m) + jll_max).ravel()
+            return np.exp(jll - log_prob_x[:, np.newaxis])
+
+        if self.kind == "tree":
+            # Gli alberi di scikit-learn confrontano le feature in float32
+            x = x.astype(np.float32).astype(np.float64)
+            left, right = a["children_left"], a["children_right"]
+            feature, threshold = a["feature"], a["threshold"]
+            node = np.zeros(len(x), dtype=np.intp)
+            rows = np.arange(len(x))
+            for _ in range(int(a["max_depth"])):
+                internal = left[node] != -1
+                if not internal.any():
+                    break
+                go_left = x[rows, np.maximum(feature[node], 0)] <= threshold[node]
+                node = np.where(internal, np.where(go_left, left[node], right[node]), node)
+            return a["proba"][node]
+
+        # knn: conteggio delle etichette dei k vicini euclidei
+        train_x, train_y, k = a["train_x"], a["train_y"], int(a["n_neighbors"])
+        counts = np.zeros((len(x), len(self.classes)))
+        for start in range(0, len(x), KNN_CHUNK_SIZE):
+            block = x[start:start + KNN_CHUNK_SIZE]
+            distances = ((block[:, np.newaxis, :] - train_x[np.newaxis, :, :]) ** 2).sum(axis=2)
+            nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            labels = train_y[nearest]
+            for c in range(len(self.classes)):
+                counts[start:start + len(block), c] = (labels == c).sum(axis=1)
+        return counts / counts.sum(axis=1)[:, np.newaxis]
+
+    def predict_proba(self, x):
+        """Come Pipeline.predict_proba: matrice (n_campioni, 2)."""
+        x = self._preprocess(x)
+        if self.kind in ("linear", "mlp", "boosting"):
+            positive = self._positive_proba(x)
+            return np.vstack([1 - positive, positive]).T
+        return self._class_proba(x)
+
+    def predict(self, x):
+        return self.classes[self.predict_proba(x).argmax(axis=1)]
+
+    def predict_one(self, values) -> float:
+        """Probabilità di Potability=1 per un singolo campione (lista dei 9 valori)."""
+        return float(self.predict_proba(np.asarray(values, dtype=np.float64).reshape(1, -1))[0, 1])
+
+    def save(self, path: str):
+        np.savez(path, kind=np.array(self.kind), **self.arrays)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path, allow_pickle=False) as archive:
+            arrays = {name: archive[name] for name in archive.files if name != "kind"}
+            kind = str(archive["kind"])
+        return cls(kind, arrays)
+
+
+def verify_export(pipeline, predictor: numpyPredictor, x) -> dict:
+    """
+    Confronta predict_proba della Pipeline con quello del predittore NumPy.
+    'identical' è True se le probabilità coincidono bit per bit.
+    """
+    expected = pipeline.predict_proba(x)
+    actual = predictor.predict_proba(x)
+    return {
+        "identical": bool(np.array_equal(expected, actual)),
+        "max_abs_diff": float(np.max(np.abs(expected - actual))) if len(expected) else 0.0,
+        "same_labels": bool(np.array_equal(pipeline.predict(x), predictor.predict(x))),
+        "rows": len(expected),
+    }
@@ -0,0 +1,154 @@
+from sklearn.base import BaseEstimator, TransformerMixin, clone
+from sklearn.linear_model import SGDClassifier
+from sklearn.naive_bayes import GaussianNB
+from sklearn.neural_network import MLPClassifier
+from sklearn.pipeline import Pipeline
+import numpy as np
+
+from .data_loader import waterData, runningStats
+from .ml_models import waterModel
+from .split_provider import get_split_provider
+
+CLASSES = np.array([0, 1])
+ONLINE_KINDS = ["sgd_logreg", "naive_bayes", "mlp"]
+
+
+class runningMeanImputer(BaseEstimator, TransformerMixin):
+    """
+    Imputer a media con aggiornamento incrementale (partial_fit):
+    la media di ogni colonna è mantenuta con l'accumulatore di Welford del data loader.
+    """
+
+    def partial_fit(self, x, y=None):
+        x = np.asarray(x, dtype=np.float64)
+        if not hasattr(self, "stats_"):
+            self.stats_ = runningStats(x.shape[1])
+        self.stats_.update(x)
+        # Colonne mai osservate: restano NaN, ci pensa runningStandardScaler
+        self.statistics_ = np.where(self.stats_.count > 0, self.stats_.mean, np.nan)
+        self.n_features_in_ = x.shape[1]
+        return self
+
+    def fit(self, x, y=None):
+        if hasattr(self, "stats_"):
+            del self.stats_
+        return self.partial_fit(x)
+
+    def transform(self, x):
+        x = np.array(x, dtype=np.float64)
+        missing = np.isnan(x)
+        if missing.any():
+            x[missing] = np.take(self.statistics_, np.nonzero(missing)[1])
+        return x
+
+
+class runningStandardScaler(BaseEstimator, TransformerMixin):
+    """
+    Standardizzazione con media e varianza aggiornate a ogni lotto (partial_fit),
+    sullo stesso accumulatore dell'imputer. I NaN non entrano nelle statistiche
+    e in uscita valgono 0, cioè la media della colonna: è il caso delle colonne
+    non ancora osservate, che così non sporcano le statistiche di quando arriveranno.
+    """
+
+    def partial_fit(self, x, y=None):
+        x = np.asarray(x, dtype=np.float64)
+        if not hasattr(self, "stats_"):
+            self.stats_ = runningStats(x.shape[1])
+        self.stats_.update(x)
+        self.mean_ = np.where(self.stats_.count > 0, self.stats_.mean, 0.0)
+        # Varianza di popolazione (ddof=0) come StandardScaler; colonne costanti: scala 1
+        scale = np.sqrt(self.stats_.variance(ddof=0))
+        self.scale_ = np.where(np.isfinite(scale) & (scale > 0), scale, 1.0)
+        self.n_features_in_ = x.shape[1]
+        return self
+
+    def fit(self, x, y=None):
+        if hasattr(self, "stats_"):
+            del self.stats_
+        return self.partial_fit(x)
+
+    def transform(self, x):
+        x = (np.asarray(x, dtype=np.float64) - self.mean_) / self.scale_
+        x[np.isnan(x)] = 0.0
+        return x
+
+
+def _online_estimator(kind: str, hidden_layers, seed: int):
+    if kind == "sgd_logreg":
+        # Regressione logistica addestrata con discesa stocastica del gradiente
+        return SGDClassifier(loss="log_loss", random_state=seed)
+    if kind == "naive_bayes":
+        return GaussianNB()
+    if kind == "mlp":
+        return MLPClassifier(hidden_layer_sizes=hidden_layers, random_state=seed)
+    raise ValueError(f"Tipo di modello online non supportato: {kind} (ammessi: {ONLINE_KINDS})")
+
+
+class waterOnlineModel(waterModel):
+    """
+    Modello ad apprendimento incrementale: Imputer e Scaler aggiornano le proprie
+    statistiche a ogni lotto e lo stimatore usa partial_fit, quindi nuovi campioni
+    etichettati si integrano a memoria costante senza riaddestrare da zero.
+    Nota: media e scala evolvono nel tempo, quindi i primi lotti vengono visti su
+    una normalizzazione leggermente diversa da quella finale.
+    """
+
+    def __init__(self, data: waterData, test_size: float, kind: str = "sgd_logreg",
+                 batch_size: int = 256, epochs: int = 5, hidden_layers=(64, 32)):
+        provider = get_split_provider(data)
+        x, y = provider.get_training_data()
+
+        pipeline = Pipeline([
+            ('imputer', runningMeanImputer()),
+            ('scaler', runningStandardScaler()),
+            ('clf', _online_estimator(kind, hidden_layers, provider.seed))
+        ])
+
+        super().__init__(pipeline, x, y, {}, test_size,
+                         {'kind': kind, 'batch_size': batch_size, 'epochs': epochs}, use_registry=False)
+        self.batch_size = batch_size
+        self.epochs = epochs
+        self.samples_seen = 0
+        self._split(provider)
+
+    def partial_fit(self, x, y):
+        """Integra un nuovo lotto di campioni etichettati (anche un solo campione)."""
+        x = np.asarray(x, dtype=np.float64)
+        if x.ndim == 1:
+            x = x.reshape(1, -1)
+        y = np.asarray(y).ravel()
+
+        imputer = self.model.named_steps['imputer']
+        scaler = self.model.named_steps['scaler']
+        imputer.partial_fit(x)
+        x = imputer.transform(x)
+        scaler.partial_fit(x)
+        self.model.named_steps['clf'].partial_fit(scaler.transform(x), y, classes=CLASSES)
+        self.samples_seen += len(y)
+        return self
+
+    def predict(self):
+        """Addestramento iniziale a mini-batch sul train set, poi valutazione sul test set."""
+        if not self._has_split():
+            raise ValueError("Split non effettuato.")
+
+        # Si riparte da una Pipeline vuota: predict() è l'addestramento iniziale
+        self.model = clone(self.model)
+        self.samples_seen = 0
+
+        # GaussianNB è esatto con un solo passaggio: ripetere i dati non cambierebbe le stime
+        epochs = 1 if isinstance(self.model.named_steps['clf'], GaussianNB) else self.epochs
+        rng = np.random.default_rng(self.provider.seed)
+        train_idx = self.train_idx
+        for epoch in range(epochs):
+            # Le statistiche di Imputer/Scaler si accumulano solo al primo passaggio
+            order = rng.permutation(train_idx)
+            for start in range(0, len(order), self.batch_size):
+                rows = order[start:start + self.batch_size]
+                if epoch == 0:
+                    self.partial_fit(self.x[rows], self.y[rows])
+                else:
+                    x = self.model[:-1].transform(self.x[rows])
+                    self.model.named_steps['clf'].partial_fit(x, self.y[rows].ravel(), classes=CLASSES)
+
+        self._calculate_scores(self.evaluate_test_set()["y_true"])
@@ -0,0 +1,128 @@
+from joblib import Parallel, delayed, dump, load
+from sklearn.base import clone
+import numpy as np
+import tempfile
+import time
+import os
+
+from .ml_models import waterModel, fit_and_score_fold
+from .split_provider import preprocessing_steps
+from .cv_cache import cv_cache
+
+
+def _share_array(array, folder: str, name: str):
+    """
+    Salva l'array su disco e lo riapre in memory-map: joblib passa ai worker
+    solo il riferimento al file, non una copia serializzata per ogni task.
+    """
+    path = os.path.join(folder, f"{name}.joblib")
+    dump(np.ascontiguousarray(array), path)
+    return load(path, mmap_mode="r")
+
+
+def _run_task(name: str, fold: int, estimator, transformers: list, x, y, train_idx, test_idx):
+    """Task eseguito nel worker: un modello su un fold."""
+    start = time.perf_counter()
+    result = fit_and_score_fold(estimator, transformers, x, y, train_idx, test_idx)
+    result["task_time"] = time.perf_counter() - start
+    return name, fold, result
+
+
+def run_parallel_cv(models: dict, folds: int = 10, n_jobs: int = -1, callback=None,
+                    compare_sequential: bool = False) -> dict:
+    """
+    Cross-Validation di più modelli in parallelo: ogni coppia (modello, fold) è un task
+    di un pool di processi. I risultati arrivano man mano che i fold terminano
+    (callback(name, fold, result, completati, totali)) e alla fine ogni modello ha
+    cv_means / cv_stds valorizzati come con evaluate_with_cross_validation().
+
+    I modelli già presenti nella cache CV non vengono rieseguiti: i loro fold
+    sono notificati subito e non entrano nel pool.
+
+    Restituisce un report con i risultati per fold, il tempo reale, la somma dei tempi
+    dei task (costo del percorso sequenziale) e lo speedup ottenuto.
+    Con compare_sequential=True il percorso sequenziale viene anche misurato davvero.
+    """
+    first: waterModel = next(iter(models.values()))
+    provider = first.provider
+    fold_indices = provider.get_folds(folds)
+    total = folds * len(models)
+
+    results = {name: [None] * folds for name in models}
+    keys = {name: model.cv_cache_key(folds) for name, model in models.items()}
+    cached = []
+    done = 0
+    for name, model in models.items():
+        stored = cv_cache.load(model.__class__.__name__, keys[name]) if keys[name] is not None else None
+        model.cv_from_cache = stored is not None
+        if stored is None:
+            continue
+        cached.append(name)
+        results[name] = stored
+        for fold, result in enumerate(stored):
+            done += 1
+            if callback is not None:
+                callback(name, fold, result, done, total)
+    pending = {name: model for name, model in models.items() if name not in cached}
+
+    # Statistiche di preprocessing stimate una volta nel processo principale
+    tasks = []
+    for i, (train_idx, test_idx) in enumerate(fold_indices):
+        for name, model in pending.items():
+            steps = preprocessing_steps(model.model)
+            transformers = provider.get_transformers(("fold", folds, i), steps)
+            estimator = clone(model.model.steps[-1][1] if steps else model.model)
+            tasks.append((name, i, estimator, transformers, train_idx, test_idx))
+
+    wall_time, sequential_time = 0.0, None
+    with tempfile.TemporaryDirectory() as folder:
+        if tasks:
+            x = _share_array(first.x, folder, "x")
+            y = _share_array(first.y, folder, "y")
+
+            start = time.perf_counter()
+            stream = Parallel(n_jobs=n_jobs, return_as="generator_unordered")(
+                delayed(_run_task)(name, i, est, tr, x, y, train_idx, test_idx)
+                for name, i, est, tr, train_idx, test_idx in tasks
+            )
+            for done, (name, fold, result) in enumerate(stream, done + 1):
+                results[name][fold] = result
+                if callback is not None:
+                    callback(name, fold, result, done, total)
+            wall_time = time.perf_counter() - start
+
+        if compare_sequential and tasks:
+            start = time.perf_counter()
+            for name, i, est, tr, train_idx, test_idx in tasks:
+                _run_task(name, i, est, tr, x, y, train_idx, test_idx)
+            sequential_time = time.perf_counter() - start
+
+    for name, model in models.items():
+        if name in pending and keys[name] is not None:
+            cv_cache.save(model.__class__.__name__, keys[name], results[name])
+        model.set_cv_results(results[name])
+
+    task_time = sum(r["task_time"] for name in pending for r in results[name])
+    reference = sequential_time if sequential_time is not None else task_time
+    return {
+        "results": results,
+        "cached": cached,
+        "wall_time": wall_time,
+        "task_time": task_time,
+        "sequential_time": sequential_time,
+        "speedup": reference / wall_time if wall_time > 0 else float("nan"),
+    }
+
+
+def print_speedup(report: dict):
+    """Stampa a video il confronto tra esecuzione parallela e sequenziale."""
+    if report.get("cached"):
+        print(f"[CV Parallela] Risultati dalla cache (non rieseguiti): {', '.join(report['cached'])}")
+        if len(report["cached"]) == len(report["results"]):
+            return
+    reference = report["sequential_time"]
+    label = "misurato" if reference is not None else "stimato (somma dei task)"
+    if reference is None:
+        reference = report["task_time"]
+    print(f"[CV Parallela] Tempo reale: {report['wall_time']:.2f}s | "
+          f"Sequenziale {label}: {reference:.2f}s | Speedup: {report['speedup']:.2f}x")
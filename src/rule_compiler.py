@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+import time
+
+from .data_loader import FEATURES, waterData
+from .batch_scoring import _iter_chunks, BATCH_CHUNK_SIZE
+from .expert_system import BaseWaterExpert, Fact, PARAM_COLUMNS, THRESHOLD_SPECS, load_thresholds
+
+# Tabella di decisione delle regole a soglia di BaseWaterExpert:
+# (flag, regola, parametro, operatore, soglia, fatto dichiarato, conta come problema, intervento)
+RULE_TABLE = (
+    ("ph_acido", "check_ph", "ph", "<", "PH_MIN", ("problema_ph", "acido"), True, "chemical"),
+    ("ph_basico", "check_ph", "ph", ">", "PH_MAX", ("problema_ph", "basico"), True, "chemical"),
+    ("solfati_alti", "check_sulfate", "sulfate", ">", "SULFATE_MAX", ("problema_solfati", "alto"), True, "chemical"),
+    ("torbidita_alta", "check_turbidity", "turbidity", ">", "TURBIDITY_MAX", ("problema_torbidita", "alta"), True, None),
+    ("solidi_alti", "check_solids", "solids", ">", "SOLIDS_MAX", ("problema_solidi", "alto"), True, None),
+    ("acqua_dura", "check_hardness", "hardness", ">", "HARDNESS_LIMIT", None, False, None),
+    ("cloramine_alte", "check_chloramines", "chloramines", ">", "CHLORAMINES_MAX", ("problema_chimico", "cloramine"), True, "chemical"),
+    ("conducibilita_alta", "check_conductivity", "conductivity", ">", "CONDUCTIVITY_MAX", None, False, None),
+    ("carbonio_alto", "check_organic_carbon", "organic_carbon", ">", "ORGANIC_CARBON_MAX", ("problema_biologico", "carbonio"), True, "physical"),
+    ("thm_alti", "check_trihalomethanes", "trihalomethanes", ">", "THM_MAX", ("problema_tossico", "thm"), True, "chemical"),
+)
+# Regola relazionale corrosion_risk: pH basso e solfati alti insieme
+CRITICAL_FLAG = "critico"
+CRITICAL_FACT = ("problem_type", "critical")
+
+OPERATORS = {"<": np.less, ">": np.greater}
+
+# Codici di csp_suggestion (int8): 0 = nessun intervento
+CSP_SUGGESTIONS = (None, "chemical", "physical", "critical")
+
+
+class batchDiagnosis:
+    """
+    Risultato della diagnosi vettoriale: un flag booleano per regola,
+    problems_count (int8) e csp_suggestion (codici int8, vedi CSP_SUGGESTIONS) per campione.
+    """
+
+    def __init__(self, flags: dict, problems_count, csp_codes, seconds: float):
+        self.flags = flags
+        self.problems_count = problems_count
+        self.csp_codes = csp_codes
+        self.seconds = seconds
+        self.rows = len(problems_count)
+
+    @property
+    def csp_suggestion(self):
+        """csp_suggestion per campione come nel motore (None, 'chemical', 'physical', 'critical')."""
+        return np.array(CSP_SUGGESTIONS, dtype=object)[self.csp_codes]
+
+    def to_frame(self) -> pd.DataFrame:
+        """Vista tabellare: un flag per colonna, problems_count e csp_suggestion."""
+        frame = pd.DataFrame(self.flags)
+        frame["problems_count"] = self.problems_count
+        frame["csp_suggestion"] = self.csp_suggestion
+        return frame
+
+    def summary(self) -> dict:
+        """Numero di campioni per flag e per intervento suggerito."""
+        counts = {flag: int(values.sum()) for flag, values in self.flags.items()}
+        counts.update({f"csp_{name}": int((self.csp_codes == code).sum())
+                       for code, name in enumerate(CSP_SUGGESTIONS) if name})
+        counts["potabili"] = int((self.problems_count == 0).sum())
+        return counts
+
+
+class compiledRules:
+    """
+    Valutatore vettoriale delle regole a soglia di BaseWaterExpert, con le soglie
+    caricate dal motore. Diagnostica in un colpo solo una matrice di campioni
+    (righe x 9 feature, ordine FEATURES); i valori NaN equivalgono a parametri non dichiarati.
+
+    csp_suggestion replica l'ordine di esecuzione di experta (DepthStrategy):
+    le regole dei fatti più recenti scattano per prime e ogni problema fa scattare
+    subito infer_chemical_need / infer_physical_need, quindi vince l'intervento
+    del primo parametro problematico nell'ordine di dichiarazione; 'critical' domina sempre.
+    """
+
+    def __init__(self, thresholds: dict, order: list = None):
+        self.thresholds = dict(thresholds)
+        self.order = list(order or PARAM_COLUMNS)
+        self.columns = {param: FEATURES.index(PARAM_COLUMNS[param]) for param in PARAM_COLUMNS}
+        # Flag che portano a un intervento, ordinati per dichiarazione del parametro
+        position = {param: i for i, param in enumerate(self.order)}
+        self._csp_rules = sorted((row for row in RULE_TABLE if row[7]), key=lambda row: position[row[2]])
+        self._csp_codes = np.array([CSP_SUGGESTIONS.index(row[7]) for row in self._csp_rules], dtype=np.int8)
+
+    def _evaluate_block(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        flags = {}
+        for flag, _, param, op, threshold, _, _, _ in RULE_TABLE:
+            flags[flag] = OPERATORS[op](x[:, self.columns[param]], self.thresholds[threshold])
+        flags[CRITICAL_FLAG] = ((x[:, self.columns["ph"]] < self.thresholds["PH_CORROSIVE_MAX"])
+                                & (x[:, self.columns["sulfate"]] > self.thresholds["SULFATE_CORROSIVE_MIN"]))
+
+        problems = np.zeros(len(x), dtype=np.int8)
+        for flag, _, _, _, _, _, counts, _ in RULE_TABLE:
+            if counts:
+                problems += flags[flag]
+
+        needs = np.column_stack([flags[row[0]] for row in self._csp_rules])
+        codes = np.where(needs.any(axis=1), self._csp_codes[needs.argmax(axis=1)], 0).astype(np.int8)
+        codes[flags[CRITICAL_FLAG]] = CSP_SUGGESTIONS.index("critical")
+        return flags, problems, codes
+
+    def evaluate(self, source, chunksize: int = BATCH_CHUNK_SIZE) -> batchDiagnosis:
+        """
+        Diagnosi di tutti i campioni di source: array / DataFrame con le 9 feature,
+        waterData oppure percorso di un file .csv o .parquet (letto a blocchi).
+        """
+        if isinstance(source, waterData):
+            source = source.get_data()
+        start = time.perf_counter()
+        blocks = [self._evaluate_block(block) for block in _iter_chunks(source, chunksize)]
+        flags = {flag: np.concatenate([b[0][flag] for b in blocks]) for flag in blocks[0][0]}
+        problems = np.concatenate([b[1] for b in blocks])
+        codes = np.concatenate([b[2] for b in blocks])
+        return batchDiagnosis(flags, problems, codes, time.perf_counter() - start)
+
+
+def compile_rules(engine: BaseWaterExpert = None, order: list = None) -> compiledRules:
+    """Compila le regole usando le soglie di un motore esistente (default: quelle caricate dall'ontologia)."""
+    if engine is None:
+        return compiledRules(load_thresholds(), order)
+    return compiledRules({name: getattr(engine, name) for name in THRESHOLD_SPECS}, order)
+
+
+def _engine_diagnosis(engine: BaseWaterExpert, row, rules: compiledRules):
+    """Esegue il motore experta su un campione, dichiarando solo i parametri non NaN."""
+    engine.reset()
+    facts = [Fact(param=param, value=float(row[rules.columns[param]])) for param in rules.order
+             if not np.isnan(row[rules.columns[param]])]
+    if facts:
+        engine.declare(*facts)
+    engine.run()
+    declared = {item for fact in engine.facts.values() for item in fact.items()}
+    return declared, engine.problems_count, engine.csp_suggestion
+
+
+def check_parity(data: waterData = None, engine: BaseWaterExpert = None, limit: int = None,
+                 order: list = None) -> dict:
+    """
+    Verifica che il valutatore vettoriale coincida con il motore experta, campione
+    per campione, su tutto il dataset (o sulle prime 'limit' righe): fatti di
+    problema dichiarati, problems_count e csp_suggestion. Le regole solo
+    informative (durezza, conducibilità) non dichiarano fatti e non sono confrontate.
+    order: ordine di dichiarazione dei parametri (default: quello dell'app).
+    """
+    data = data if data is not None else waterData()
+    engine = engine if engine is not None else BaseWaterExpert()
+    rules = compile_rules(engine, order)
+    x = data.get_data()[FEATURES].to_numpy(dtype=np.float64)
+    if limit is not None:
+        x = x[:limit]
+
+    diagnosis = rules.evaluate(x)
+    suggestions = diagnosis.csp_suggestion
+    fact_flags = [(row[0], row[5]) for row in RULE_TABLE if row[5]] + [(CRITICAL_FLAG, CRITICAL_FACT)]
+
+    start = time.perf_counter()
+    mismatches = []
+    for i, row in enumerate(x):
+        declared, problems, suggestion = _engine_diagnosis(engine, row, rules)
+        differences = [flag for flag, fact in fact_flags if (fact in declared) != bool(diagnosis.flags[flag][i])]
+        if problems != diagnosis.problems_count[i]:
+            differences.append("problems_count")
+        if suggestion != suggestions[i]:
+            differences.append("csp_suggestion")
+        if differences:
+            mismatches.append((i, differences))
+    engine_seconds = time.perf_counter() - start
+
+    return {
+        "rows": len(x),
+        "mismatches": mismatches,
+        "identical": not mismatches,
+        "engine_seconds": engine_seconds,
+        "vectorized_seconds": diagnosis.seconds,
+        "speedup": engine_seconds / diagnosis.seconds if diagnosis.seconds > 0 else float("inf"),
+        "summary": diagnosis.summary(),
+    }
+
+
+def print_parity(report: dict):
+    """Stampa a video l'esito della verifica di parità."""
+    esito = "IDENTICI" if report["identical"] else f"{len(report['mismatches'])} DIFFERENZE"
+    print(f"\nParità motore experta / valutatore vettoriale su {report['rows']} campioni: {esito}")
+    for i, differences in report["mismatches"][:10]:
+        print(f"   riga {i}: {', '.join(differences)}")
+    print(f"   Motore experta:       {report['engine_seconds']:.2f}s")
+    print(f"   Valutatore vettoriale: {report['vectorized_seconds'] * 1000:.2f}ms (x{report['speedup']:,.0f})")
+    print("\n   " + ", ".join(f"{name}: {count}" for name, count in report["summary"].items()))
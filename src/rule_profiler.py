@@ -0,0 +1,110 @@
+import json
+import time
+
+
+class ruleProfiler:
+    """
+    Profiler opzionale del ciclo di esecuzione del motore: si aggancia a un
+    BaseWaterExpert (o sottoclasse) con attach() e registra, per ogni regola,
+    attivazioni eseguite, tempo cumulativo e massimo; per ogni run() i fatti
+    dichiarati dalle regole, la dimensione della memoria di lavoro e dell'agenda.
+    Senza profiler agganciato il motore non paga alcun costo di misura.
+    """
+
+    def __init__(self):
+        self.rules = {}
+        self.runs = 0
+        self.run_seconds = 0.0
+        self.facts_declared = []
+        self.facts_total = []
+        self.agenda_max = []
+        self.agenda_steps = 0
+        self.agenda_sum = 0
+        self._run_start = None
+        self._run_facts = 0
+        self._run_agenda = 0
+
+    def attach(self, engine):
+        """Aggancia il profiler al motore (le esecuzioni successive vengono misurate)."""
+        engine.profiler = self
+        return engine
+
+    @staticmethod
+    def detach(engine):
+        engine.profiler = None
+        return engine
+
+    # --- Chiamati da BaseWaterExpert.run() ---
+
+    def start_run(self, engine):
+        self._run_start = time.perf_counter()
+        self._run_facts = engine.facts.last_index
+        self._run_agenda = 0
+
+    def record_agenda(self, size: int):
+        self.agenda_steps += 1
+        self.agenda_sum += size
+        self._run_agenda = max(self._run_agenda, size)
+
+    def record_rule(self, name: str, seconds: float):
+        stats = self.rules.setdefault(name, {"count": 0, "total_s": 0.0, "max_s": 0.0})
+        stats["count"] += 1
+        stats["total_s"] += seconds
+        stats["max_s"] = max(stats["max_s"], seconds)
+
+    def end_run(self, engine):
+        self.runs += 1
+        self.run_seconds += time.perf_counter() - self._run_start
+        self.facts_declared.append(engine.facts.last_index - self._run_facts)
+        self.facts_total.append(len(engine.facts))
+        self.agenda_max.append(self._run_agenda)
+
+    # --- Esportazione ---
+
+    def to_dict(self) -> dict:
+        """Statistiche aggregate, con le regole ordinate per tempo cumulativo."""
+        runs = max(self.runs, 1)
+        fired_seconds = sum(stats["total_s"] for stats in self.rules.values())
+        rules = {
+            name: {**stats,
+                   "mean_us": stats["total_s"] / stats["count"] * 1e6,
+                   "per_run": stats["count"] / runs,
+                   "share": stats["total_s"] / fired_seconds if fired_seconds > 0 else 0.0}
+            for name, stats in sorted(self.rules.items(), key=lambda item: -item[1]["total_s"])
+        }
+        return {
+            "runs": self.runs,
+            "run_seconds": self.run_seconds,
+            "fired_seconds": fired_seconds,
+            "activations": sum(stats["count"] for stats in self.rules.values()),
+            "facts_declared_mean": sum(self.facts_declared) / runs,
+            "facts_declared_max": max(self.facts_declared, default=0),
+            "working_memory_mean": sum(self.facts_total) / runs,
+            "agenda_mean": self.agenda_sum / self.agenda_steps if self.agenda_steps else 0.0,
+            "agenda_max": max(self.agenda_max, default=0),
+            "rules": rules,
+        }
+
+    def save_json(self, path: str) -> dict:
+        """Salva le statistiche in JSON e le restituisce."""
+        report = self.to_dict()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        return report
+
+    def print_table(self, sort_by: str = "total_s"):
+        """Stampa a video la tabella delle regole, dalla più costosa (sort_by: total_s, max_s, count)."""
+        report = self.to_dict()
+        print("\n" + "=" * 92)
+        print(f"{'REGOLA':<24} | {'ATTIVAZIONI':>11} | {'PER RUN':>7} | {'TOTALE (ms)':>11} | "
+              f"{'MEDIA (us)':>10} | {'MAX (us)':>9} | QUOTA")
+        print("-" * 92)
+        for name, stats in sorted(report["rules"].items(), key=lambda item: -item[1][sort_by]):
+            print(f"{name:<24} | {stats['count']:>11} | {stats['per_run']:>7.2f} | {stats['total_s'] * 1000:>11.2f} | "
+                  f"{stats['mean_us']:>10.1f} | {stats['max_s'] * 1e6:>9.1f} | {stats['share']:>5.1%}")
+        print("=" * 92)
+        print(f"Run: {report['runs']} | tempo nei run {report['run_seconds']:.2f}s, di cui nelle regole "
+              f"{report['fired_seconds']:.2f}s | attivazioni: {report['activations']}")
+        print(f"Fatti dichiarati dalle regole per run: media {report['facts_declared_mean']:.1f}, "
+              f"max {report['facts_declared_max']} | memoria di lavoro media: {report['working_memory_mean']:.1f} fatti")
+        print(f"Agenda: media {report['agenda_mean']:.1f}, max {report['agenda_max']} attivazioni in attesa")
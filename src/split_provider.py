@@ -0,0 +1,104 @@
+from sklearn.base import clone
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.pipeline import Pipeline
+import numpy as np
+import copy
+
+from .data_loader import waterData
+
+# Seme unico: tutti i modelli vengono confrontati sugli stessi split
+RANDOM_STATE = 42
+
+
+def preprocessing_steps(model):
+    """Passi di preprocessing di una Pipeline (tutti tranne lo stimatore finale)."""
+    if isinstance(model, Pipeline):
+        return model.steps[:-1]
+    return []
+
+
+def apply_transformers(transformers: list, x):
+    """Applica in sequenza i trasformatori già stimati."""
+    for transformer in transformers:
+        x = transformer.transform(x)
+    return x
+
+
+class splitProvider:
+    """
+    Split train/test e fold di Cross-Validation stratificati, calcolati una sola
+    volta per dataset e seme. Per ogni split vengono stimati (una volta) anche
+    Imputer e Scaler: i modelli ricevono le statistiche già pronte invece di
+    rifare lo stesso preprocessing ciascuno per conto proprio.
+    """
+
+    def __init__(self, data: waterData, seed: int = RANDOM_STATE):
+        self.x, self.y = data.get_training_data()
+        self.labels = self.y.ravel()
+        self.fingerprint = data.fingerprint
+        self.seed = seed
+
+        self._splits = {}        # test_size -> (train_idx, test_idx)
+        self._folds = {}         # n_folds -> [(train_idx, test_idx), ...]
+        self._transformers = {}  # (chiave split, firma preprocessing) -> [trasformatori stimati]
+
+    def get_training_data(self):
+        return self.x, self.y
+
+    def get_split(self, test_size: float):
+        """Indici (train, test) dello split stratificato con la test_size indicata."""
+        if test_size not in self._splits:
+            self._splits[test_size] = train_test_split(
+                np.arange(len(self.labels)), test_size=test_size,
+                stratify=self.labels, random_state=self.seed)
+        return self._splits[test_size]
+
+    def get_folds(self, n_folds: int):
+        """Lista di coppie di indici (train, test) della StratifiedKFold."""
+        if n_folds not in self._folds:
+            kfold = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=self.seed)
+            self._folds[n_folds] = list(kfold.split(np.zeros(len(self.labels)), self.labels))
+        return self._folds[n_folds]
+
+    def get_indices(self, split_key: tuple):
+        """Indici di uno split identificato da ('split', test_size) o ('fold', n_folds, i)."""
+        if split_key[0] == "split":
+            return self.get_split(split_key[1])
+        return self.get_folds(split_key[1])[split_key[2]]
+
+    def get_transformers(self, split_key: tuple, steps: list):
+        """
+        Trasformatori di preprocessing stimati sulla parte di train dello split.
+        La cache è per prefisso di Pipeline: l'Imputer stimato per l'albero
+        (solo imputer) è lo stesso riusato dai modelli con imputer + scaler.
+        """
+        if not steps:
+            return []
+        signature = tuple(f"{name}:{step!r}" for name, step in steps)
+        key = (split_key, signature)
+        if key not in self._transformers:
+            previous = self.get_transformers(split_key, steps[:-1])
+            train_idx, _ = self.get_indices(split_key)
+            x_train = apply_transformers(previous, self.x[train_idx])
+            fitted = clone(steps[-1][1]).fit(x_train)
+            self._transformers[key] = previous + [fitted]
+        return self._transformers[key]
+
+    def fitted_copy(self, split_key: tuple, steps: list):
+        """
+        Copia dei trasformatori stimati, da inserire nella Pipeline di un modello:
+        così un eventuale nuovo fit della Pipeline non altera la cache condivisa.
+        """
+        return copy.deepcopy(self.get_transformers(split_key, steps))
+
+
+def get_split_provider(data: waterData, seed: int = RANDOM_STATE) -> splitProvider:
+    """
+    Provider condiviso da tutti i waterModel dello stesso waterData e seme.
+    È conservato sull'oggetto dati: viene liberato con esso e ricalcolato
+    quando il DataFrame viene sostituito (data.data = ...).
+    """
+    providers = data._split_providers
+    if seed not in providers:
+        providers[seed] = splitProvider(data, seed)
+    return providers[seed]